@@ -1,31 +1,49 @@
-import os, io, wave, uuid, json, asyncio
-from datetime import datetime
+import os, uuid, json, asyncio, time, importlib, secrets
+from datetime import datetime, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Depends, HTTPException, Query, status
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from urllib.parse import parse_qs
 import sqlalchemy as sa
 import uvicorn
-import webrtcvad
 
 # Socket.IO (ASGI)
 import socketio
 
 # ---- bring in YOUR logic (copy these files into app/services) ----
-from app.services.transcribe import transcribe_audio
-from app.services.prompts import  messages_snapshot, build_messages_from_db
-from app.services.llm import get_llm_response
-from app.services.db import SessionLocal, engine, Base
-from app.services.auth import hash_password, verify_password, create_access_token, decode_token
+from app.services import guard, metrics
+from app.services.audio_gate import segment_skip_reason
+from app.services.ws_protocol import FrameDecoder, negotiate
+from app.services.answer_sink import SocketIOSink, WebSocketSink
+from app.services.incremental import IncrementalTranscriber, join_transcripts
+from app.services.segment_buffer import SegmentBuffer
+from app.services.endpointing import Endpointer
+from app.services.prompts import  messages_snapshot, build_prompt, count_tokens
+from app.services.provenance import prompt_ref
+from app.services.retrieval import profile_indexes, relevant_excerpts
+from app.services.answer_cache import answer_cache, profile_version, refresh_in_background, standalone, ANSWER_CACHE_ENABLED, ANSWER_CACHE_REFRESH
+from app.services.speculative import AnswerTask, SPECULATE_AFTER_MS
+from app.services.pipeline import TurnPipeline
+from app.services.clients import close_clients
+from app.services.cluster import client_manager, invalidations
+from app.services.db import SessionLocal, AsyncSessionLocal, engine, async_engine, Base
+from app.services.auth import (hash_password_async, verify_password_async, create_access_token, decode_token,
+                               PasswordHashBusy)
+from app.services.auth_cache import auth_cache, AuthUser
 from app.services import models
+from app.services.context_cache import context_cache, CONTEXT_TURNS
+from app.services.history import transcripts_page, sessions_page
+from app.services import persistence
+from app.services.persistence import turn_writer, segment_writer, SAVE_SEGMENTS
 from app.services.models import User as DBUser
 
 # Create tables automatically at startup
@@ -36,46 +54,6 @@ Base.metadata.create_all(bind=engine)
 RATE = 16000
 FRAME_MS = 30
 FRAME_BYTES = int(RATE * FRAME_MS / 1000) * 2  # 960 bytes (16kHz mono s16le)
-SILENCE_SEC = 2.5
-MIN_TEXT_CHARS = 5          # drop text shorter than this
-MIN_TEXT_TOKENS = 2          # also require at least 2 tokens/words
-SAVE_SEGMENTS = True
-FILLER_PHRASES = {
-    # Short fillers & interjections
-    "um", "uh", "hmm", "mm", "er", "ah", "eh", "huh",
-    "hmmm", "hmm..", "hmm...", "hmmm...", "hmm.", "hmm...",
-    
-    # Common Whisper hallucinations / YouTube-style phrases
-    "thanks for watching",
-    " Thanks for Watching ",
-    "Thank you for watching.",
-    "Thank you for watching!",
-    "Thanks for watching!",
-    "Thank you. Good.",
-    "Thanks for watching. Bye.",
-    "I'll see you in the next video.",
-    "Thank you very much.",
-    "please like",
-    "please like share",
-    "please like share subscribe",
-    "like share subscribe",
-    "subscribe to my channel",
-    "see you in the next video",
-    "see you next time",
-    "check out my other videos",
-    "don't forget to like",
-    "don't forget to subscribe",
-    "hit the bell icon",
-    "smash that like button",
-    "follow for more",
-    "follow me for more",
-    "share and subscribe",
-    "and subscribe",
-    "watch my other videos",
-    "watch next video",
-    "watch next"
-}
-
 
 
 BASE = Path(__file__).resolve().parents[1]
@@ -87,9 +65,31 @@ for p in ["recordings", "transcripts", "responses", "prompts", "sessions"]:
 print("Loaded main from:", __file__)
 
 # ---------------------- app wiring ----------------------
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+def _on_invalidate(kind, user_id, session_id):
+    """Another worker changed a profile or a user, or saved a turn."""
+    if kind == "user":
+        context_cache.invalidate_user(user_id)
+        answer_cache.invalidate_user(user_id)
+    elif kind == "session":
+        context_cache.invalidate_session(user_id, session_id)
+    elif kind == "auth":
+        auth_cache.invalidate_user(user_id)
+
+async def on_startup():
+    await invalidations.start(_on_invalidate)
+    await persistence.start()
+
+async def on_shutdown():
+    await persistence.close()       # drain queued turns and segments while the DB and Redis are still up
+    await invalidations.close()
+    await close_clients()
+    await async_engine.dispose()
+
+# with SOCKETIO_MESSAGE_QUEUE set, emits are relayed between workers (app/services/cluster.py)
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", client_manager=client_manager())
 fastapi = FastAPI()
-app = socketio.ASGIApp(sio, fastapi)
+# ASGIApp answers the lifespan protocol itself, so startup/shutdown hooks are registered here
+app = socketio.ASGIApp(sio, fastapi, on_startup=on_startup, on_shutdown=on_shutdown)
 
 # Serve worklet and index
 fastapi.mount("/static", StaticFiles(directory=str(BASE / "app" / "static")), name="static")
@@ -122,6 +122,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 class RegisterIn(BaseModel):
     email: EmailStr
     password: str
@@ -134,26 +138,38 @@ class TokenOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-def save_turn_db(db: Session, *, user_id, session_id, user_text, assistant_text, tokens=0, meta=None):
-    row = models.Transcript(
-        user_id=user_id,
-        session_id=session_id,
-        text=user_text,
-        assistant_text=assistant_text,
-        tokens=tokens or 0,
-        meta=meta or {}
-    )
-    db.add(row)
-    db.commit()
-    return row
-
-def list_history_db(db: Session, *, user_id, session_id):
+async def save_turn_db(*, user_id, session_id, user_text, assistant_text, tokens=0, meta=None, parts=None):
+    """Queue the turn for the write-behind writer (app/services/persistence.py); returns its id."""
+    now = datetime.now(timezone.utc)     # set here, not by the server, so keyset cursors round-trip exactly
+    turn = {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "session_id": session_id,
+        "text": user_text,
+        "assistant_text": assistant_text,
+        "tokens": tokens or 0,
+        "meta": meta or {},
+        "created_at": now,
+        "parts": parts,
+    }
+    # the next turn's prompt sees this one straight away, committed or not
+    context_cache.append_turn(user_id, session_id, {
+        "timestamp": now.isoformat(),
+        "user": user_text or "",
+        "assistant": assistant_text or "",
+        "id": str(turn["id"]),
+    })
+    await turn_writer.submit(turn)
+    return turn["id"]
+
+async def list_history_db(db: AsyncSession, *, user_id, session_id, limit=None):
     q = (
-        db.query(models.Transcript)
-        .filter(models.Transcript.user_id == user_id, models.Transcript.session_id == session_id)
+        sa.select(models.Transcript)
+        .where(models.Transcript.user_id == user_id, models.Transcript.session_id == session_id)
         .order_by(models.Transcript.created_at.desc())
+        .limit(limit)
     )
-    rows = q.all()
+    rows = (await db.scalars(q)).all()
     return [
         {
             "timestamp": r.created_at.isoformat(),
@@ -165,20 +181,31 @@ def list_history_db(db: Session, *, user_id, session_id):
     ]
 
 # ---------- Auth: routes ----------
+async def _hashing(coro):
+    """bcrypt runs on the password hashing pool (app/services/auth.py); a full queue is a 503."""
+    try:
+        return await coro
+    except PasswordHashBusy:
+        raise HTTPException(status_code=503, detail="Too many logins, retry shortly", headers={"Retry-After": "1"})
+
 @fastapi.post("/auth/register")
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
+async def register(payload: RegisterIn, db: AsyncSession = Depends(get_async_db)):
     email = payload.email.lower().strip()
-    if db.query(models.User).filter(models.User.email == email).first():
+    if await db.scalar(sa.select(models.User.id).where(models.User.email == email)):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    u = models.User(email=email, password_hash=await _hashing(hash_password_async(payload.password)))
+    db.add(u)
+    try:
+        await db.commit()
+    except sa.exc.IntegrityError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    u = models.User(email=email, password_hash=hash_password(payload.password))
-    db.add(u); db.commit()
     return {"ok": True}
 
 @fastapi.post("/auth/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
+async def login(payload: LoginIn, db: AsyncSession = Depends(get_async_db)):
     email = payload.email.lower().strip()
-    u = db.query(models.User).filter(models.User.email == email).first()
-    if not u or not verify_password(payload.password, u.password_hash):
+    u = await db.scalar(sa.select(models.User).where(models.User.email == email))
+    if not u or not await _hashing(verify_password_async(payload.password, u.password_hash)):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token(str(u.id))
     return TokenOut(access_token=token)
@@ -186,58 +213,90 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
 # ---------- Auth: current user dependency ----------
 security = HTTPBearer(auto_error=False)
 
-def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
+async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(security)):
+    """The active user behind the bearer token, as an AuthUser (app/services/auth_cache.py)."""
     if not creds:
         raise HTTPException(status_code=401, detail="Missing credentials")
-    data = decode_token(creds.credentials)
-    if not data:
-        raise HTTPException(status_code=401, detail="Invalid/expired token")
-    uid = data.get("sub")
-    u = db.get(models.User, uid)
-    if not u or not u.is_active:
-        raise HTTPException(status_code=401, detail="Inactive user")
-    return u
+    uid = auth_cache.token(creds.credentials)
+    if uid is None:
+        data = decode_token(creds.credentials)
+        if not data:
+            raise HTTPException(status_code=401, detail="Invalid/expired token")
+        try:
+            uid = uuid.UUID(str(data.get("sub")))
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid/expired token")
+        auth_cache.put_token(creds.credentials, uid, data.get("exp"))
+    user = auth_cache.user(uid)
+    if user is None:
+        async with AsyncSessionLocal() as db:
+            u = await db.get(models.User, uid)
+        if not u or not u.is_active:
+            raise HTTPException(status_code=401, detail="Inactive user")
+        user = auth_cache.put_user(u)
+    return user
 
 # ---------- Test route to verify auth works ----------
 @fastapi.get("/me")
 def me(user = Depends(get_current_user)):
     return {"id": str(user.id), "email": user.email}
 
-# ---------------------- helpers ----------------------
-vad = webrtcvad.Vad(3)
+# ---------------------- Socket.IO: per-session rooms ----------------------
+def _session_room(user_id, session_id) -> str | None:
+    """Room that receives one user's answer tokens for one chat session."""
+    if not user_id or not session_id:
+        return None
+    return f"{user_id}:{session_id}"
+
+
+@sio.event
+async def connect(sid, environ, auth):
+    claims = decode_token((auth or {}).get("token") or "")
+    if not claims:
+        return False
+    await sio.save_session(sid, {"user_id": claims.get("sub")})
+
+
+@sio.event
+async def join(sid, data):
+    """Move this socket into the room of the session it is currently showing."""
+    sess = await sio.get_session(sid)
+    for room in sio.rooms(sid):
+        if room != sid:
+            await sio.leave_room(sid, room)
+    room = _session_room(sess.get("user_id"), (data or {}).get("session_id"))
+    if room:
+        await sio.enter_room(sid, room)
 
-def _wav_from_pcm16(pcm: bytes, rate=RATE) -> bytes:
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(rate)
-        wf.writeframes(pcm)
-    return buf.getvalue()
-
-
-def _load_profile_and_history(user_id: str | None, session_id: str | None):
+# ---------------------- helpers ----------------------
+async def _load_profile_and_history(user_id: str | None, session_id: str | None):
     """Fetch resume/projects/JD and the short chat history for this session."""
     resume = projects = jd = ""
     history = []
     if not user_id:
         return resume, projects, jd, history
 
-    db: Session = SessionLocal()
-    try:
-        prof = db.get(models.UserProfile, user_id)
+    cached = context_cache.get(user_id, session_id) if session_id else None
+    if cached:
+        (resume, projects, jd), history = cached
+        return resume, projects, jd, history
+
+    generation = context_cache.generation(user_id)      # a profile save during the reads below wins
+    async with AsyncSessionLocal() as db:
+        prof = await db.get(models.UserProfile, uuid.UUID(str(user_id)))
         if prof:
             resume   = prof.resume or ""
             projects = prof.projects or ""
             jd       = prof.job_description or ""
         if session_id:
-            history = list_history_db(db, user_id=user_id, session_id=session_id)
-    finally:
-        try: db.close()
-        except Exception: pass
+            history = await list_history_db(db, user_id=uuid.UUID(str(user_id)), session_id=session_id,
+                                            limit=CONTEXT_TURNS)
+            pending = turn_writer.pending(user_id, session_id)
+            if pending:
+                seen = {t["id"] for t in history}
+                history = ([t for t in pending if t["id"] not in seen] + history)[:CONTEXT_TURNS]
+    if session_id:
+        context_cache.put(user_id, session_id, (resume, projects, jd), history, generation)
     return resume, projects, jd, history
 
 
@@ -245,7 +304,7 @@ def _load_profile_and_history(user_id: str | None, session_id: str | None):
 @fastapi.put("/profile")
 def upsert_profile(payload: dict,
                    db: Session = Depends(get_db),
-                   user: models.User = Depends(get_current_user)):
+                   user: AuthUser = Depends(get_current_user)):
     resume = (payload.get("resume") or "").strip()
     projects = (payload.get("Projects") or "").strip()
     jd = (payload.get("job_description") or "").strip()
@@ -257,11 +316,15 @@ def upsert_profile(payload: dict,
         row = models.UserProfile(user_id=user.id, resume=resume, projects=projects, job_description=jd)
         db.add(row)
     db.commit()
+    context_cache.invalidate_user(user.id)
+    answer_cache.invalidate_user(user.id)
+    invalidations.publish_sync("user", user.id)
+    profile_indexes.get(user.id, resume, projects, jd)
     return {"ok": True}
 
 @fastapi.get("/profile")
 def get_profile(db: Session = Depends(get_db),
-                user: models.User = Depends(get_current_user)):
+                user: AuthUser = Depends(get_current_user)):
     row = db.get(models.UserProfile, user.id)
     return {
         "resume": row.resume if row else "",
@@ -271,29 +334,36 @@ def get_profile(db: Session = Depends(get_db),
 
 @fastapi.post("/start-chat")
 def start_chat(db: Session = Depends(get_db),
-               user: models.User = Depends(get_current_user)):
+               user: AuthUser = Depends(get_current_user)):
     # Just mint a fresh session_id and return it; no disk writes.
     session_id = uuid.uuid4().hex
     return {"session_id": session_id}
 
 
+async def _page(coro):
+    try:
+        return await coro
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @fastapi.get("/get_chat_history")
-def get_chat_history(request: Request,
-                     db: Session = Depends(lambda: SessionLocal()),
-                     user: models.User = Depends(get_current_user)):
+async def get_chat_history(request: Request,
+                           limit: int | None = Query(None, ge=1),
+                           cursor: str | None = None,
+                           db: AsyncSession = Depends(get_async_db),
+                           user: AuthUser = Depends(get_current_user)):
+    """Newest first, one page at a time; the next page's cursor is in X-Next-Cursor."""
     sid = request.headers.get("X-Session-Id") #or _read_last_session_id()
     if not sid:
         return JSONResponse({"error": "No active session"}, status_code=400)
 
-    rows = (
-        db.query(models.Transcript)
-          .filter(models.Transcript.user_id == user.id,
-                  models.Transcript.session_id == sid)
-          .order_by(models.Transcript.created_at.desc())
-          .all()
-    )
-
-    return [
+    # turns still in the write-behind queue, e.g. the answer that just completed
+    pending = turn_writer.pending_rows(user.id, sid)
+    rows, next_cursor = await _page(transcripts_page(db, user.id, sid, cursor=cursor, limit=limit,
+                                                     newest_first=True, pending=pending))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse([
         {
             "id": str(r.id),
             "timestamp": r.created_at.isoformat(),
@@ -301,57 +371,45 @@ def get_chat_history(request: Request,
             "assistant": r.assistant_text or "",
         }
         for r in rows
-    ]
+    ], headers=headers)
 
 @fastapi.get("/history/sessions")
-def list_user_sessions(
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+async def list_user_sessions(
+    limit: int | None = Query(None, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthUser = Depends(get_current_user),
 ):
-    """Return all distinct session IDs for this user, newest activity first."""
-    rows = (
-        db.query(
-            models.Transcript.session_id.label("session_id"),
-            sa.func.max(models.Transcript.created_at).label("last_created"),
-        )
-        .filter(
-            models.Transcript.user_id == user.id,
-            models.Transcript.session_id.isnot(None),
-            models.Transcript.session_id != "",
-        )
-        .group_by(models.Transcript.session_id)
-        .order_by(sa.desc(sa.func.max(models.Transcript.created_at)))
-        .all()
-    )
+    """Return this user's sessions, newest activity first, one page at a time."""
+    rows, next_cursor = await _page(sessions_page(db, user.id, cursor=cursor, limit=limit))
     return {
         "sessions": [
             {
                 "session_id": r.session_id,
-                "last_created": r.last_created.isoformat() if r.last_created else None,
+                "last_created": r.last_activity.isoformat(),
+                "turn_count": r.turn_count,
             }
             for r in rows
-        ]
+        ],
+        "next_cursor": next_cursor,
     }
 
 
 @fastapi.get("/history/transcripts")
-def transcripts_for_session(
+async def transcripts_for_session(
     session_id: str = Query(..., min_length=1),
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthUser = Depends(get_current_user),
 ):
-    """Return all messages for the selected session, oldest → newest."""
-    rows = (
-        db.query(models.Transcript)
-        .filter(
-            models.Transcript.user_id == user.id,
-            models.Transcript.session_id == session_id,
-        )
-        .order_by(models.Transcript.created_at.asc(), models.Transcript.id.asc())
-        .all()
-    )
+    """Return messages for the selected session, oldest → newest, one page at a time."""
+    pending = turn_writer.pending_rows(user.id, session_id)
+    rows, next_cursor = await _page(transcripts_page(db, user.id, session_id, cursor=cursor, limit=limit,
+                                                     pending=pending))
     return {
         "session_id": session_id,
+        "next_cursor": next_cursor,
         "messages": [
             {
                 "id": str(r.id),
@@ -365,6 +423,29 @@ def transcripts_for_session(
     }
 
 
+# ---------------------- metrics ----------------------
+for _name in ("audio_gate", "audio_codec", "ws_protocol", "speculative", "pipeline", "guard",
+              "context_cache", "answer_cache", "answer_sink", "persistence", "auth", "auth_cache"):
+    metrics.register_stats(_name, importlib.import_module(f"app.services.{_name}").STATS)
+
+def _check_metrics_token(request: Request):
+    if metrics.METRICS_TOKEN and not secrets.compare_digest(
+            request.headers.get("authorization", ""), f"Bearer {metrics.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+@fastapi.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """Prometheus text format: turn stage histograms plus every service's STATS (this worker only)."""
+    _check_metrics_token(request)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@fastapi.get("/metrics/turns")
+async def recent_turn_traces(request: Request):
+    """The last TRACE_KEEP per-turn records, oldest first."""
+    _check_metrics_token(request)
+    return {"turns": metrics.recent_turns()}
+
+
 # ---------------------- WebSocket: audio -> VAD -> process ----------------------
 @fastapi.websocket("/ws-audio")
 async def ws_audio(ws: WebSocket):
@@ -379,85 +460,202 @@ async def ws_audio(ws: WebSocket):
     except Exception:
         user_id = None
 
-    # Initial hello {session_id, sample_rate, frame_ms}
+    # Initial hello {session_id, sample_rate, frame_ms, protocols}
     try:
         hello = json.loads(await ws.receive_text())
         session_id = hello.get("session_id") #or _read_last_session_id()
     except Exception:
-        session_id = None #_read_last_session_id()
+        hello, session_id = {}, None #_read_last_session_id()
+    ready = negotiate(hello)
+    decoder = FrameDecoder(ready["protocol"], FRAME_BYTES)
+    await ws.send_text(json.dumps(ready))
 
     if not session_id:
         print("[ws-audio] no session; audio will be ignored until /start-session is called")
 
-    frames, in_speech, silence_ms = [], False, 0.0
-
-    async def finalize_segment():
-        nonlocal frames
-        if not frames:
-            return
-        pcm = b"".join(frames)
-        frames = []
+    # tokens for this connection only go to the browser(s) joined to its room,
+    # or straight back over this socket when the client asked for that
+    room = _session_room(user_id, session_id)
+    sink = WebSocketSink(ws) if ready["answers"] == "ws" else SocketIOSink(sio, room)
 
-        wav_bytes = _wav_from_pcm16(pcm)
+    segment: SegmentBuffer | None = None      # allocated at speech onset
+    endpointer = Endpointer(rate=RATE, frame_ms=FRAME_MS)
+    partials = IncrementalTranscriber(frame_ms=FRAME_MS)
 
+    speculation: AnswerTask | None = None
+    carried = None      # transcript of a question split at the segment cap, answered with what follows
 
-        # 1) transcribe (your function)
-        text = await asyncio.to_thread(transcribe_audio, wav_bytes)
+    async def prepare_turn(transcribe):
+        text, asr_meta = await transcribe
+        metrics.mark("transcribed")
 
         # --- POST-TRANSCRIPTION GUARD: drop fillers, hallucinations, and empty outputs ---
-        clean = (text or "").strip()
-
-        # Tokenize roughly
-        tokens = [t for t in clean.replace(",", " ").split() if t]
-
-        # Check 1: Empty or whitespace-only transcript
-        if not clean:
-            return
-
-        # Check 2: Too short (very likely meaningless)
-        if len(tokens) < 2 or len(clean) < 12:
-            return
-
-        # Check 3: Filler / hallucination phrases (match anywhere in text)
-        if clean in FILLER_PHRASES:
-                return 
-
-
-        resume, projects, jd, history = _load_profile_and_history(user_id, session_id)
+        reason = guard.check(text, asr_meta)
+        metrics.mark("guard")
+        if reason:
+            print(f"[guard] dropped ({reason}): {text!r}")
+            return None
+        text = text.strip()
+
+        resume, projects, jd, history = await _load_profile_and_history(user_id, session_id)
+        metrics.mark("context_loaded")
+        version = profile_version(resume, projects, jd)
+        # follow-ups ("an example of that?") depend on the history, which the cache key does not cover
+        cacheable = ANSWER_CACHE_ENABLED and standalone(text, history)
+        cached = answer_cache.get(user_id, version, text) if cacheable else None
+        # long profiles: a short fixed profile head, and the chunks relevant to this question in the turn message
+        excerpts, profile_tokens = relevant_excerpts(user_id, resume, projects, jd, text)
         # 2) build prompt w/ short history (your format)
-        messages = build_messages_from_db(resume=resume, projects=projects, job_description=jd, history=history, transcript=text, max_turns=5)
-
-  
-        # 3) stream tokens via Socket.IO and buffer final
-        await sio.emit('clear')
-        buf = []
-        for tok in get_llm_response(messages, stream=True):
-            buf.append(tok)
-            await sio.emit('token', {'token': tok})
+        messages, info = build_prompt(resume=resume, projects=projects, job_description=jd, history=history, transcript=text,
+                                      max_turns=CONTEXT_TURNS, excerpts=excerpts, profile_tokens=profile_tokens)
+        ref, parts = prompt_ref(messages, info["turns"], info["clipped"], excerpts)
+        metrics.mark("prompt_built")
+        return {"text": text, "messages": messages, "ref": ref, "parts": parts,
+                "tokens": info["tokens"], "version": version, "cached": cached, "cacheable": cacheable}
+
+    async def answer_segment(job):
+        trace = job[-1]
+        outcome = "error"
+        try:
+            outcome = await answer_turn(*job)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            trace.finish(outcome)
+
+    async def answer_turn(segment, turn, transcript, trace):
+        try:
+            # 1) transcribe + build prompt; a speculative answer started during the pause is reused
+            prepared = None
+            if turn is not None:
+                try:
+                    prepared = await turn.ready()
+                except Exception as e:
+                    if not turn.speculative:
+                        raise
+                    print("[speculative] failed, answering normally:", e)
+                    turn = None
+                    with metrics.tracing(trace):
+                        transcript = join_transcripts(transcript, partials.transcribe(segment.pcm()))
+            if turn is None:
+                turn = AnswerTask(lambda: prepare_turn(transcript), trace=trace)
+                prepared = await turn.ready()
+            if prepared is None:
+                return "dropped"
+            text, tokens = prepared["text"], prepared["tokens"]
+
+            # 3) stream tokens to the client and buffer final
+            await sink.clear()
+            buf = []
+            async for tok in turn.stream():
+                if not buf:
+                    trace.mark("first_token")
+                buf.append(tok)
+                await sink.token(tok)
+        except asyncio.CancelledError:
+            # superseded by a newer question: stop the transcription and LLM stream too
+            if turn is not None:
+                turn.cancel()
+            if transcript is not None:
+                transcript.cancel()
+            raise
+        trace.mark("last_token")
 
         full = "".join(buf)
+        tokens = {**tokens, "answer": count_tokens(full)}
+        if prepared["cached"] is None:
+            if prepared["cacheable"]:
+                answer_cache.put(user_id, prepared["version"], text, full, turn.llm_seconds)
+        elif ANSWER_CACHE_REFRESH:
+            refresh_in_background(user_id, prepared["version"], text, prepared["messages"])
 
         if user_id:
             try:
-                db: Session = SessionLocal()
-                # If you already defined save_turn_db in Step 3, use it:
-                try:
-                    # save_turn_db(db, *, user_id, session_id, user_text, assistant_text, tokens=0, meta=None)
-                
-                    save_turn_db(
-                        db,
-                        user_id=user_id,
-                        session_id=session_id or "",
-                        user_text=text,
-                        assistant_text=full,
-                        tokens=0,
-                        meta={"messages": messages,},
-                    )
-                finally:
-                    db.close()
+                await save_turn_db(
+                    user_id=uuid.UUID(str(user_id)),
+                    session_id=session_id or "",
+                    user_text=text,
+                    assistant_text=full,
+                    tokens=tokens["prompt"] + tokens["answer"],
+                    meta={"prompt": prepared["ref"], "tokens": tokens,
+                          "cached": prepared["cached"] is not None},
+                    parts=prepared["parts"],
+                )
             except Exception as e:
                 print("[save_turn_db] error:", e)
-        await sio.emit('complete')
+            trace.mark("saved")
+        await sink.complete()
+        return "answered"
+
+    def drop_job(job):
+        _, turn, transcript, trace = job
+        if turn is not None:
+            turn.cancel()
+        if transcript is not None:
+            transcript.cancel()
+        trace.finish("dropped")
+
+    pipeline = TurnPipeline(answer_segment, on_drop=drop_job)
+
+    async def end_segment(silence_ms: float = 0.0, split: bool = False):
+        """
+        Hand the finished segment to the pipeline; the receive loop waits for the
+        noise gate (run in a worker thread) only, never for transcription or the answer.
+        With split (the segment cap was hit mid-question) it is only transcribed,
+        and the text is carried into the turn that ends the question.
+        """
+        nonlocal segment, speculation, carried
+        if segment is None and carried is None:
+            return
+        now = time.monotonic()
+        done, segment = segment, None
+        turn, speculation = speculation, None
+        if not room:
+            return
+        if split:
+            if turn is not None:
+                turn.cancel()
+            if SAVE_SEGMENTS:
+                segment_writer.submit(session_id, done.wav())
+            carried = join_transcripts(carried, partials.finish(done))
+            return
+        head, carried = carried, None
+        if turn is not None and not turn.failed():
+            trace = turn.trace
+        else:
+            trace = metrics.TurnTrace(now - silence_ms / 1000, session_id=session_id, speculative=False)
+        trace.mark("end_detected", now)
+        # --- PRE-TRANSCRIPTION GATE: clicks, keyboard noise, coughs (NumPy, so in a worker thread) ---
+        reason = await asyncio.to_thread(segment_skip_reason, done.pcm()) if done is not None else "empty"
+        if reason:
+            partials.cancel()
+            if turn is not None:
+                turn.cancel()
+            if head is None:
+                print(f"[gate] skipped segment ({reason}): {len(done) * FRAME_MS} ms")
+                trace.finish("skipped")
+                return
+            # the tail after a split was noise: answer what came before it
+            turn, transcript = None, head
+        elif turn is not None and not turn.failed():
+            turn.confirm()
+            if SAVE_SEGMENTS:
+                segment_writer.submit(session_id, done.wav())
+            partials.reset()
+            transcript = head       # already in the speculation; kept for its fallback
+        else:
+            if SAVE_SEGMENTS:
+                segment_writer.submit(session_id, done.wav())
+            # earlier chunks were already sent while the speaker was talking
+            with metrics.tracing(trace):
+                turn, transcript = None, join_transcripts(head, partials.finish(done))
+        if turn is None and pipeline.cancel_stale:
+            # prepare now, so a question can supersede the answer still streaming
+            turn = AnswerTask(lambda t=transcript: prepare_turn(t), trace=trace)
+        ticket = pipeline.submit((done, turn, transcript, trace))
+        if turn is not None:
+            turn.when_prepared(lambda: pipeline.supersede(ticket))
 
     try:
         while True:
@@ -473,22 +671,51 @@ async def ws_audio(ws: WebSocket):
             if "bytes" not in m:
                 continue
 
-            frame = m["bytes"]
-            if len(frame) != FRAME_BYTES:
-                continue
-
-            if vad.is_speech(frame, RATE):
-                frames.append(frame); in_speech = True; silence_ms = 0.0
-            elif in_speech:
-                frames.append(frame); silence_ms += FRAME_MS
-                if silence_ms >= SILENCE_SEC * 1000:
-                    await finalize_segment()
-                    in_speech = False; silence_ms = 0.0
+            for frame in decoder.feed(m["bytes"]):
+                silence_ms = endpointer.silence_ms
+                added, end_of_turn = endpointer.push(frame)
+                while added:
+                    if segment is None:
+                        segment = SegmentBuffer(rate=RATE, frame_bytes=FRAME_BYTES)
+                    added = added[segment.extend(added):]
+                    if room:
+                        partials.on_frames(segment)
+                        endpointer.set_hint(partials.latest)
+                    if segment.full:
+                        # long monologue: transcribe what we have and keep listening
+                        print(f"[ws-audio] segment cap reached ({len(segment) * FRAME_MS} ms), splitting")
+                        await end_segment(split=True)
+                if end_of_turn:
+                    await end_segment(silence_ms + FRAME_MS)
+                elif room and endpointer.in_speech:
+                    # speculate on a probable end of turn; drop it as soon as speech resumes
+                    if speculation is None and segment is not None and SPECULATE_AFTER_MS \
+                            and endpointer.silence_ms >= SPECULATE_AFTER_MS:
+                        trace = metrics.TurnTrace(time.monotonic() - endpointer.silence_ms / 1000,
+                                                  session_id=session_id, speculative=True)
+                        trace.mark("speculated")
+                        head = asyncio.shield(carried) if carried is not None else None
+                        speculation = AnswerTask(
+                            lambda seg=segment, n=len(segment), head=head:
+                                prepare_turn(join_transcripts(head, partials.peek(seg, n))),
+                            speculative=True, trace=trace)
+                    elif speculation is not None and endpointer.silence_ms == 0:
+                        speculation.cancel()
+                        speculation = None
     finally:
         try:
-            await finalize_segment()
+            await end_segment()
+            await pipeline.close()
+        except asyncio.CancelledError:
+            partials.cancel()
+            pipeline.cancel()
+            if speculation is not None:
+                speculation.cancel()
+            raise
         except Exception as e:
             print("[ws-audio] finalize error:", e)
+        finally:
+            await sink.close()
         print("[ws-audio] client disconnected")
 
 if __name__ == "__main__":
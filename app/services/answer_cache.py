@@ -0,0 +1,183 @@
+# app/services/answer_cache.py
+"""
+Per-user cache of answers to repeated interview questions.
+
+Transcripts are normalised (case, punctuation, spoken fillers) and turned into
+a sparse unigram+bigram vector; a cached answer is reused when the cosine
+similarity to an earlier question is above ANSWER_CACHE_THRESHOLD, both ask
+with the same content words (so "...Oracle to MongoDB" never answers
+"...Oracle to Postgres") and the profile it was generated from is unchanged.
+
+Follow-ups only make sense against the conversation so far ("Can you give me
+an example of that?", "Why?"), so standalone() keeps short or anaphoric
+questions out of the cache whenever the turn has history.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from app.services.llm import stream_llm_response
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9"))
+ANSWER_CACHE_TTL_SEC = float(os.getenv("ANSWER_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+ANSWER_CACHE_PER_USER = int(os.getenv("ANSWER_CACHE_PER_USER", "200"))
+ANSWER_CACHE_USERS = int(os.getenv("ANSWER_CACHE_USERS", "1000"))
+ANSWER_CACHE_REFRESH = os.getenv("ANSWER_CACHE_REFRESH", "0") == "1"   # regenerate in background on hit
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("ANSWER_CACHE_MIN_WORDS", "3"))  # shorter questions with history are follow-ups
+
+STATS = {"hits": 0, "misses": 0, "evictions": 0, "seconds_saved": 0.0, "follow_ups": 0}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_FILLERS = frozenset("so um uh umm er ah okay ok well like just actually basically now alright right".split())
+# words that point back at earlier turns
+_ANAPHORA = frozenset("""that that's this these those it it's its they them their there then he she him her
+    why how example examples elaborate more further else again instead also differently""".split())
+# words that do not change what is being asked; all other words must match for a fuzzy hit
+_STOPWORDS = frozenset("""a an the and or of to in on at for with about from by as into is are was were be
+    been being do does did can could would should will you your you're i i'm me my we our us what which
+    when where who tell give walk describe explain talk please some any through""".split())
+
+
+def normalize(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall((text or "").lower()) if w not in _FILLERS]
+
+
+def embed(text: str) -> Counter:
+    words = normalize(text)
+    return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def content_words(words: list[str]) -> frozenset:
+    return frozenset(w for w in words if w not in _STOPWORDS)
+
+
+def standalone(transcript: str, history) -> bool:
+    """Whether the answer can be reused regardless of the conversation before it."""
+    if not history:
+        return True
+    words = normalize(transcript)
+    if len(words) < ANSWER_CACHE_MIN_WORDS or not _ANAPHORA.isdisjoint(words):
+        STATS["follow_ups"] += 1
+        return False
+    return True
+
+
+def _cosine(a: Counter, na: float, b: Counter, nb: float) -> float:
+    if not na or not nb:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0) for k, v in a.items()) / (na * nb)
+
+
+def profile_version(resume: str, projects: str, job_description: str) -> str:
+    h = hashlib.sha1()
+    for part in (resume, projects, job_description):
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("key", "terms", "vec", "norm", "answer", "version", "expires", "seconds")
+
+    def __init__(self, key, terms, vec, answer, version, expires, seconds):
+        self.key = key
+        self.terms = terms
+        self.vec = vec
+        self.norm = math.sqrt(sum(v * v for v in vec.values()))
+        self.answer = answer
+        self.version = version
+        self.expires = expires
+        self.seconds = seconds      # how long the LLM took to produce it
+
+
+class AnswerCache:
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL_SEC,
+                 per_user: int = ANSWER_CACHE_PER_USER, users: int = ANSWER_CACHE_USERS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.per_user = per_user
+        self.users = users
+        self._data: OrderedDict[str, OrderedDict[str, _Entry]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version: str, transcript: str) -> str | None:
+        words = normalize(transcript)
+        key = " ".join(words)
+        if not key:
+            return None
+        terms = content_words(words)
+        vec = embed(transcript)
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        now = time.monotonic()
+        with self._lock:
+            entries = self._data.get(str(user_id))
+            best, best_sim = None, self.threshold
+            if entries:
+                for k in [k for k, e in entries.items() if e.expires < now]:
+                    del entries[k]
+                exact = entries.get(key)
+                if exact is not None and exact.version == version:
+                    best = exact
+                else:
+                    for e in entries.values():
+                        if e.version != version or e.terms != terms:
+                            continue
+                        sim = _cosine(vec, norm, e.vec, e.norm)
+                        if sim >= best_sim:
+                            best, best_sim = e, sim
+            if best is None:
+                STATS["misses"] += 1
+                return None
+            entries.move_to_end(best.key)
+            STATS["hits"] += 1
+            STATS["seconds_saved"] += best.seconds
+            return best.answer
+
+    def put(self, user_id, version: str, transcript: str, answer: str, seconds: float = 0.0) -> None:
+        words = normalize(transcript)
+        key = " ".join(words)
+        if not key or not answer:
+            return
+        uid = str(user_id)
+        with self._lock:
+            entries = self._data.get(uid)
+            if entries is None:
+                entries = self._data[uid] = OrderedDict()
+                while len(self._data) > self.users:
+                    STATS["evictions"] += len(self._data.popitem(last=False)[1])
+            self._data.move_to_end(uid)
+            entries[key] = _Entry(key, content_words(words), embed(transcript), answer, version, time.monotonic() + self.ttl, seconds)
+            entries.move_to_end(key)
+            while len(entries) > self.per_user:
+                entries.popitem(last=False)
+                STATS["evictions"] += 1
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+
+_background: set[asyncio.Task] = set()
+
+
+def refresh_in_background(user_id, version: str, transcript: str, messages: list[dict]) -> None:
+    """Regenerate a cached answer off the response path so the next hit is fresh."""
+    async def _refresh():
+        t0 = time.monotonic()
+        answer = "".join([tok async for tok in stream_llm_response(messages)])
+        answer_cache.put(user_id, version, transcript, answer, time.monotonic() - t0)
+
+    task = asyncio.create_task(_refresh())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+answer_cache = AnswerCache()
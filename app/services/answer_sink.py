@@ -0,0 +1,105 @@
+# app/services/answer_sink.py
+"""
+Where a /ws-audio connection's answer events (clear / token / complete) go.
+
+SocketIOSink emits them to the session's Socket.IO room, one message per
+token (the original transport, still the default). WebSocketSink sends them
+back over the audio WebSocket itself as small JSON text frames, coalescing
+tokens until ANSWER_FLUSH_CHARS characters are buffered or ANSWER_FLUSH_MS
+has passed since the first one, so a 300-token answer is a few dozen
+messages instead of 300.
+"""
+import asyncio
+import json
+import os
+
+ANSWER_FLUSH_MS = float(os.getenv("ANSWER_FLUSH_MS", "40"))
+ANSWER_FLUSH_CHARS = int(os.getenv("ANSWER_FLUSH_CHARS", "64"))
+
+STATS = {"messages": {"socketio": 0, "ws": 0}, "tokens": 0}
+
+
+class SocketIOSink:
+    kind = "socketio"
+
+    def __init__(self, sio, room: str):
+        self.sio = sio
+        self.room = room
+
+    async def _emit(self, event: str, data=None) -> None:
+        STATS["messages"]["socketio"] += 1
+        await self.sio.emit(event, data, to=self.room)
+
+    async def clear(self) -> None:
+        await self._emit("clear")
+
+    async def token(self, tok: str) -> None:
+        STATS["tokens"] += 1
+        await self._emit("token", {"token": tok})
+
+    async def complete(self) -> None:
+        await self._emit("complete")
+
+    async def close(self) -> None:
+        pass
+
+
+class WebSocketSink:
+    kind = "ws"
+
+    def __init__(self, ws, *, flush_ms: float = ANSWER_FLUSH_MS, flush_chars: int = ANSWER_FLUSH_CHARS):
+        self.ws = ws
+        self.flush_ms = flush_ms
+        self.flush_chars = flush_chars
+        self._buf: list[str] = []
+        self._chars = 0
+        self._timer: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    async def _send(self, msg: dict) -> None:
+        if self._closed:
+            return
+        async with self._lock:
+            try:
+                await self.ws.send_text(json.dumps(msg, separators=(",", ":")))
+                STATS["messages"]["ws"] += 1
+            except Exception:
+                self._closed = True         # client went away; the turn still completes and is saved
+
+    def _take(self) -> str:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        text, self._buf, self._chars = "".join(self._buf), [], 0
+        return text
+
+    async def flush(self) -> None:
+        text = self._take()
+        if text:
+            await self._send({"type": "token", "token": text})
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_ms / 1000)
+        await self.flush()
+
+    async def clear(self) -> None:
+        self._take()                        # tokens of a superseded answer must not follow the clear
+        await self._send({"type": "clear"})
+
+    async def token(self, tok: str) -> None:
+        STATS["tokens"] += 1
+        self._buf.append(tok)
+        self._chars += len(tok)
+        if self._chars >= self.flush_chars or self.flush_ms <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def complete(self) -> None:
+        await self.flush()
+        await self._send({"type": "complete"})
+
+    async def close(self) -> None:
+        self._take()
+        self._closed = True
@@ -0,0 +1,99 @@
+# app/services/audio_codec.py
+"""
+Encodes 16 kHz mono s16le PCM for upload to the transcription API.
+
+AUDIO_UPLOAD_FORMAT picks wav, flac or opus (Ogg). FLAC and Opus use
+soundfile (libsndfile) when it is installed and the ffmpeg binary otherwise;
+if neither can produce the format, uploads fall back to WAV. Encoding is
+CPU-bound, so callers run it in a worker thread together with the upload.
+"""
+import io
+import os
+import shutil
+import struct
+import subprocess
+import time
+
+try:
+    import numpy as np
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+RATE = 16000
+AUDIO_UPLOAD_FORMAT = os.getenv("AUDIO_UPLOAD_FORMAT", "flac").lower()     # wav | flac | opus
+AUDIO_OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+STATS = {"encoded": {}, "bytes_pcm": 0, "bytes_sent": 0, "seconds": 0.0}
+
+_MIME = {"wav": "audio/wav", "flac": "audio/flac", "opus": "audio/ogg"}
+_EXT = {"wav": "wav", "flac": "flac", "opus": "ogg"}
+_warned: set[str] = set()
+
+
+def wav_header(pcm_bytes: int, rate: int = RATE) -> bytes:
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + pcm_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+                       rate, rate * 2, 2, 16, b"data", pcm_bytes)
+
+
+def pcm_to_wav(pcm, rate: int = RATE) -> bytes:
+    return b"".join((wav_header(len(pcm), rate), pcm))
+
+
+def _soundfile(pcm, rate: int, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    samples = np.frombuffer(pcm, dtype="<i2")
+    if fmt == "flac":
+        sf.write(buf, samples, rate, format="FLAC", subtype="PCM_16")
+    else:
+        sf.write(buf, samples, rate, format="OGG", subtype="OPUS")
+    return buf.getvalue()
+
+
+def _ffmpeg(pcm, rate: int, fmt: str) -> bytes:
+    codec = ["-c:a", "flac", "-f", "flac"] if fmt == "flac" else \
+        ["-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-application", "voip", "-f", "ogg"]
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+         "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "pipe:0", *codec, "pipe:1"],
+        input=pcm, capture_output=True, check=True,
+    )
+    return proc.stdout
+
+
+def _encoder(fmt: str):
+    if fmt == "wav":
+        return lambda pcm, rate, _fmt: pcm_to_wav(pcm, rate)
+    if fmt not in _MIME:
+        return None
+    if sf is not None and (fmt == "flac" or "OPUS" in sf.available_subtypes("OGG")):
+        return _soundfile
+    if shutil.which(FFMPEG_BIN):
+        return _ffmpeg
+    return None
+
+
+def available_formats() -> list[str]:
+    return [f for f in _MIME if _encoder(f) is not None]
+
+
+def encode(pcm, fmt: str = AUDIO_UPLOAD_FORMAT, rate: int = RATE) -> tuple[str, bytes, str]:
+    """(filename, data, mime) ready for the transcription upload."""
+    t0 = time.perf_counter()
+    encoder = _encoder(fmt)
+    if encoder is None:
+        if fmt not in _warned:
+            _warned.add(fmt)
+            print(f"[audio] no encoder for {fmt!r}; uploading WAV")
+        fmt, encoder = "wav", _encoder("wav")
+    try:
+        data = encoder(pcm, rate, fmt)
+    except Exception as e:
+        print(f"[audio] {fmt} encode failed, uploading WAV:", e)
+        fmt, data = "wav", pcm_to_wav(pcm, rate)
+    STATS["encoded"][fmt] = STATS["encoded"].get(fmt, 0) + 1
+    STATS["bytes_pcm"] += len(pcm)
+    STATS["bytes_sent"] += len(data)
+    STATS["seconds"] += time.perf_counter() - t0
+    return f"audio.{_EXT[fmt]}", data, _MIME[fmt]
@@ -0,0 +1,102 @@
+# app/services/audio_gate.py
+"""
+Local pre-transcription gate for 16 kHz mono s16le PCM.
+
+Segments are cut into 30 ms frames and scored with NumPy in one pass:
+per-frame RMS energy, the share of frames above the energy gate, voiced
+duration and spectral flatness (noise, clicks and keyboard taps are flat;
+speech is peaky). Segments that don't look like speech are never uploaded,
+and leading/trailing silence is trimmed from the ones that are.
+"""
+import os
+
+import numpy as np
+
+RATE = 16000
+FRAME_SAMPLES = 480                 # 30 ms
+GATE_ENABLED = os.getenv("GATE_ENABLED", "1") == "1"
+GATE_FRAME_RMS = float(os.getenv("GATE_FRAME_RMS", "300"))            # int16 scale
+GATE_MIN_SPEECH_SEC = float(os.getenv("GATE_MIN_SPEECH_SEC", "0.3"))
+GATE_MIN_SPEECH_RATIO = float(os.getenv("GATE_MIN_SPEECH_RATIO", "0.15"))
+GATE_MAX_FLATNESS = float(os.getenv("GATE_MAX_FLATNESS", "0.45"))
+GATE_TRIM_MARGIN_MS = float(os.getenv("GATE_TRIM_MARGIN_MS", "150"))
+
+STATS = {
+    "segments_checked": 0,
+    "segments_skipped": 0,
+    "skip_reasons": {},
+    "chunks_skipped": 0,
+    "bytes_in": 0,
+    "bytes_saved": 0,       # skipped segments/chunks plus trimmed silence
+}
+
+_WINDOW = np.hanning(FRAME_SAMPLES).astype(np.float32)
+
+
+def features(pcm) -> dict:
+    """Frame-level energy/flatness summary of a PCM buffer (bytes, bytearray or memoryview)."""
+    x = np.frombuffer(pcm, dtype="<i2")
+    n = len(x) // FRAME_SAMPLES
+    if n == 0:
+        return {"frames": 0, "voiced": np.zeros(0, dtype=bool), "speech_ratio": 0.0,
+                "voiced_sec": 0.0, "rms": 0.0, "flatness": 1.0}
+    frames = x[:n * FRAME_SAMPLES].reshape(n, FRAME_SAMPLES).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    voiced = rms >= GATE_FRAME_RMS
+    flatness = 1.0
+    if voiced.any():
+        power = np.abs(np.fft.rfft(frames[voiced] * _WINDOW, axis=1)) ** 2 + 1e-10
+        flat = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        # speech only needs some clearly tonal (voiced) frames; background noise is flat throughout
+        flatness = float(np.percentile(flat, 25))
+    return {
+        "frames": n,
+        "voiced": voiced,
+        "speech_ratio": float(voiced.mean()),
+        "voiced_sec": float(voiced.sum()) * FRAME_SAMPLES / RATE,
+        "rms": float(np.sqrt(np.mean(rms * rms))),
+        "flatness": flatness,
+    }
+
+
+def _reason(f: dict) -> str | None:
+    if f["voiced_sec"] < GATE_MIN_SPEECH_SEC:
+        return "too_little_speech"
+    if f["speech_ratio"] < GATE_MIN_SPEECH_RATIO:
+        return "low_speech_ratio"
+    if f["flatness"] > GATE_MAX_FLATNESS:
+        return "noise_like"
+    return None
+
+
+def segment_skip_reason(pcm) -> str | None:
+    """Why a finished segment should not be transcribed at all, or None."""
+    if not GATE_ENABLED:
+        return None
+    STATS["segments_checked"] += 1
+    reason = _reason(features(pcm))
+    if reason:
+        STATS["segments_skipped"] += 1
+        STATS["skip_reasons"][reason] = STATS["skip_reasons"].get(reason, 0) + 1
+        STATS["bytes_saved"] += len(pcm)
+    return reason
+
+
+def trim_for_upload(pcm) -> memoryview | None:
+    """View of the PCM with leading/trailing silence trimmed, or None if the chunk holds no speech."""
+    STATS["bytes_in"] += len(pcm)
+    if not GATE_ENABLED:
+        return memoryview(pcm)
+    f = features(pcm)
+    if _reason(f):
+        STATS["chunks_skipped"] += 1
+        STATS["bytes_saved"] += len(pcm)
+        return None
+    idx = np.flatnonzero(f["voiced"])
+    margin = int(GATE_TRIM_MARGIN_MS / 30)
+    start = max(0, int(idx[0]) - margin) * FRAME_SAMPLES * 2
+    end = min(f["frames"], int(idx[-1]) + 1 + margin) * FRAME_SAMPLES * 2
+    if idx[-1] + 1 + margin >= f["frames"]:
+        end = len(pcm)          # keep any sub-frame remainder after speech
+    STATS["bytes_saved"] += len(pcm) - (end - start)
+    return memoryview(pcm)[start:end]
@@ -1,21 +1,60 @@
 # app/services/auth.py
+import asyncio
 import datetime as dt
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
-PWDCTX = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))           # cost of new hashes; existing hashes verify at their own cost
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))  # waiting beyond the workers; more get PasswordHashBusy
+
+PWDCTX = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=BCRYPT_ROUNDS)
 ALGO = "HS256"
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 ACCESS_TOKEN_MIN = int(os.getenv("ACCESS_TOKEN_MINUTES", "45"))
 
+STATS = {"hashed": 0, "verified": 0, "rejected": 0, "in_flight": 0}
+
+# bcrypt releases the GIL, so a small pool of its own keeps login bursts off
+# the default threadpool that the sync endpoints run in
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+class PasswordHashBusy(Exception):
+    """The password hashing queue is full."""
+
+
 def hash_password(pw: str) -> str:
     return PWDCTX.hash(pw)
 
 def verify_password(pw: str, pw_hash: str) -> bool:
     return PWDCTX.verify(pw, pw_hash)
 
+async def _offload(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        STATS["rejected"] += 1
+        raise PasswordHashBusy()
+    STATS["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        STATS["in_flight"] -= 1
+        _hash_slots.release()
+
+async def hash_password_async(pw: str) -> str:
+    STATS["hashed"] += 1
+    return await _offload(hash_password, pw)
+
+async def verify_password_async(pw: str, pw_hash: str) -> bool:
+    STATS["verified"] += 1
+    return await _offload(verify_password, pw, pw_hash)
+
 def create_access_token(sub: str) -> str:
     now = dt.datetime.utcnow()
     payload = {
@@ -0,0 +1,96 @@
+# app/services/auth_cache.py
+"""
+Short-lived cache behind get_current_user: verified bearer tokens (token ->
+user id, never past the token's own exp) and active users (id -> AuthUser).
+Inactive or missing users are never cached, so reactivation is immediate;
+deactivation takes effect after at most AUTH_CACHE_TTL_SEC, or at once
+through invalidate_user() (and the "auth" invalidation message on other
+workers). AUTH_CACHE_TTL_SEC=0 turns the cache off.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+AUTH_CACHE_TTL_SEC = float(os.getenv("AUTH_CACHE_TTL_SEC", "30"))
+
+STATS = {"token_hits": 0, "token_misses": 0, "user_hits": 0, "user_misses": 0,
+         "evictions": 0, "invalidations": 0}
+
+
+class AuthUser:
+    """What authenticated endpoints need of a user, safe to share between requests."""
+    __slots__ = ("id", "email", "is_active")
+
+    def __init__(self, id, email: str, is_active: bool = True):
+        self.id = id
+        self.email = email
+        self.is_active = is_active
+
+
+class AuthCache:
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._tokens: OrderedDict[str, tuple] = OrderedDict()     # token -> (user id, expires)
+        self._users: OrderedDict[str, tuple] = OrderedDict()      # str(user id) -> (AuthUser, expires)
+        self._lock = threading.Lock()
+
+    def _get(self, data: OrderedDict, key, counter: str):
+        with self._lock:
+            hit = data.get(key)
+            if hit is None or hit[1] < time.monotonic():
+                if hit is not None:
+                    del data[key]
+                STATS[f"{counter}_misses"] += 1
+                return None
+            data.move_to_end(key)
+            STATS[f"{counter}_hits"] += 1
+            return hit[0]
+
+    def _put(self, data: OrderedDict, key, value, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            data[key] = (value, time.monotonic() + ttl)
+            data.move_to_end(key)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+                STATS["evictions"] += 1
+
+    def token(self, token: str):
+        """User id of a token verified within the TTL, or None."""
+        return self._get(self._tokens, token, "token")
+
+    def put_token(self, token: str, user_id, exp) -> None:
+        left = float(exp) - time.time() if exp is not None else self.ttl
+        self._put(self._tokens, token, user_id, min(self.ttl, left))
+
+    def user(self, user_id) -> AuthUser | None:
+        return self._get(self._users, str(user_id), "user")
+
+    def put_user(self, user) -> AuthUser:
+        """Snapshot an active models.User; returns the snapshot."""
+        snap = AuthUser(user.id, user.email, user.is_active)
+        self._put(self._users, str(user.id), snap, self.ttl)
+        return snap
+
+    def invalidate_user(self, user_id) -> None:
+        """Drop the user and every cached token for them; call after deactivating or changing a user."""
+        uid = str(user_id)
+        with self._lock:
+            dropped = self._users.pop(uid, None) is not None
+            for key in [k for k, (v, _) in self._tokens.items() if str(v) == uid]:
+                del self._tokens[key]
+                dropped = True
+            if dropped:
+                STATS["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+
+auth_cache = AuthCache()
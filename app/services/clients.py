@@ -0,0 +1,74 @@
+# app/services/clients.py
+import os
+import threading
+
+import httpx
+import openai
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None   # e.g. a local stand-in server
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "30"))
+OPENAI_CONNECT_TIMEOUT_SEC = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SEC", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_SEC = float(os.getenv("OPENAI_KEEPALIVE_SEC", "60"))
+
+_lock = threading.Lock()
+_sync_client: openai.OpenAI | None = None
+_async_client: openai.AsyncOpenAI | None = None
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_TIMEOUT_SEC, connect=OPENAI_CONNECT_TIMEOUT_SEC)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_SEC,
+    )
+
+
+def get_openai_client() -> openai.OpenAI:
+    """Process-wide sync client; its connection pool is shared by all worker threads."""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = openai.OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    base_url=OPENAI_BASE_URL,
+                    timeout=_timeout(),
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _sync_client
+
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """Process-wide async client for code running on the event loop."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = openai.AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    base_url=OPENAI_BASE_URL,
+                    timeout=_timeout(),
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _async_client
+
+
+async def close_clients() -> None:
+    """Close pooled connections; called from the app shutdown hook."""
+    global _sync_client, _async_client
+    with _lock:
+        sync_client, async_client = _sync_client, _async_client
+        _sync_client = _async_client = None
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.close()
@@ -0,0 +1,101 @@
+# app/services/cluster.py
+"""
+Multi-worker support.
+
+With SOCKETIO_MESSAGE_QUEUE set (a redis:// URL; any Redis-compatible server
+works), Socket.IO emits go through the queue, so tokens produced by the
+worker that owns a /ws-audio connection reach the browser's Socket.IO
+connection on whichever worker it landed on. The same server carries cache
+invalidations: a profile change or a saved turn on one worker drops the stale
+context/answer cache entries on all the others.
+
+Without it everything stays in-process and only a single worker is supported.
+"""
+import asyncio
+import json
+import os
+import uuid
+
+import socketio
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None     # e.g. redis://localhost:6379/0
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "audio_agent")
+INVALIDATION_CHANNEL = f"{SOCKETIO_CHANNEL}:invalidate"
+
+
+def client_manager():
+    """Socket.IO client manager for AsyncServer(client_manager=...); None means in-process."""
+    if not SOCKETIO_MESSAGE_QUEUE:
+        return None
+    return socketio.AsyncRedisManager(SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL)
+
+
+class Invalidations:
+    """Fan-out of cache invalidations to the other workers over Redis pub/sub."""
+
+    def __init__(self, url: str | None = SOCKETIO_MESSAGE_QUEUE):
+        self.url = url
+        self.worker_id = uuid.uuid4().hex
+        self._redis = None
+        self._sync = None
+        self._task: asyncio.Task | None = None
+
+    def _message(self, kind: str, user_id, session_id) -> str:
+        return json.dumps({"from": self.worker_id, "kind": kind, "user_id": str(user_id), "session_id": session_id})
+
+    async def publish(self, kind: str, user_id, session_id: str | None = None) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(INVALIDATION_CHANNEL, self._message(kind, user_id, session_id))
+        except Exception as e:
+            print("[cluster] publish failed:", e)
+
+    def publish_sync(self, kind: str, user_id, session_id: str | None = None) -> None:
+        """For sync endpoints running in the threadpool."""
+        if not self.url:
+            return
+        try:
+            if self._sync is None:
+                import redis
+                self._sync = redis.Redis.from_url(self.url)
+            self._sync.publish(INVALIDATION_CHANNEL, self._message(kind, user_id, session_id))
+        except Exception as e:
+            print("[cluster] publish failed:", e)
+
+    async def start(self, handler) -> None:
+        """Subscribe and call handler(kind, user_id, session_id) for other workers' messages."""
+        if not self.url:
+            return
+        import redis.asyncio as aioredis
+        self._redis = aioredis.Redis.from_url(self.url)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        self._task = asyncio.create_task(self._listen(pubsub, handler))
+        print(f"[cluster] worker {self.worker_id[:8]} using message queue {self.url}")
+
+    async def _listen(self, pubsub, handler) -> None:
+        while True:
+            try:
+                async for msg in pubsub.listen():
+                    data = json.loads(msg["data"])
+                    if data.get("from") != self.worker_id:
+                        handler(data["kind"], data["user_id"], data.get("session_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("[cluster] invalidation listener error, resubscribing:", e)
+                await asyncio.sleep(1.0)
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._redis is not None:
+            await self._redis.aclose()
+        if self._sync is not None:
+            self._sync.close()
+
+
+invalidations = Invalidations()
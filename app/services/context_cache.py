@@ -0,0 +1,99 @@
+# app/services/context_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+CONTEXT_CACHE_TTL_SEC = float(os.getenv("CONTEXT_CACHE_TTL_SEC", "900"))
+CONTEXT_TURNS = int(os.getenv("CONTEXT_TURNS", "5"))
+
+STATS = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_puts": 0}
+
+
+class _Entry:
+    __slots__ = ("profile", "turns", "expires")
+
+    def __init__(self, profile, turns, expires):
+        self.profile = profile      # (resume, projects, job_description)
+        self.turns = turns          # deque of history dicts, newest first
+        self.expires = expires
+
+
+class ContextCache:
+    """
+    LRU/TTL cache of per-(user, session) prompt context: the profile texts and
+    a ring buffer of the last N turns. Turns are written through on save, and
+    all of a user's entries are dropped when their profile changes.
+
+    Invalidations bump a per-user generation; a loader reads generation()
+    before it queries and passes it to put(), which then refuses to cache
+    what it read if an invalidation came in between.
+    """
+
+    def __init__(self, maxsize: int = CONTEXT_CACHE_SIZE, ttl: float = CONTEXT_CACHE_TTL_SEC,
+                 turns: int = CONTEXT_TURNS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.turns = turns
+        self._data: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, session_id):
+        """(profile, history newest-first) or None on a miss."""
+        key = (str(user_id), session_id)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                STATS["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            STATS["hits"] += 1
+            return entry.profile, list(entry.turns)
+
+    def generation(self, user_id) -> int:
+        with self._lock:
+            return self._generations.get(str(user_id), 0)
+
+    def put(self, user_id, session_id, profile, history, generation: int | None = None) -> None:
+        key = (str(user_id), session_id)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key[0], 0):
+                STATS["stale_puts"] += 1
+                return
+            self._data[key] = _Entry(profile, deque(history[:self.turns], maxlen=self.turns),
+                                     time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                STATS["evictions"] += 1
+
+    def append_turn(self, user_id, session_id, turn: dict) -> None:
+        """Write-through for a newly saved turn; a cold entry is left for the next load."""
+        with self._lock:
+            entry = self._data.get((str(user_id), session_id))
+            if entry is not None:
+                entry.turns.appendleft(turn)
+
+    def invalidate_session(self, user_id, session_id) -> None:
+        with self._lock:
+            self._bump(str(user_id))
+            if self._data.pop((str(user_id), session_id), None) is not None:
+                STATS["invalidations"] += 1
+
+    def invalidate_user(self, user_id) -> None:
+        uid = str(user_id)
+        with self._lock:
+            self._bump(uid)
+            for key in [k for k in self._data if k[0] == uid]:
+                del self._data[key]
+                STATS["invalidations"] += 1
+
+    def _bump(self, uid: str) -> None:
+        self._generations[uid] = self._generations.get(uid, 0) + 1
+
+
+context_cache = ContextCache()
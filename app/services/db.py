@@ -1,12 +1,51 @@
 # app/services/db.py
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
-engine = create_engine(DATABASE_URL, future=True, echo=True)
+_ASYNC_DRIVERS = {
+    "postgres://": "postgresql+psycopg://",
+    "postgresql://": "postgresql+psycopg://",
+    "postgresql+psycopg2://": "postgresql+psycopg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+
+def async_url(url: str) -> str:
+    """Same database, async-capable driver (psycopg 3 for Postgres, aiosqlite for SQLite)."""
+    for prefix, driver in _ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+
+def _pool_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+engine = create_engine(DATABASE_URL, future=True, echo=DB_ECHO, **_pool_kwargs(DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# used by the WebSocket hot path and the history endpoints
+async_engine = create_async_engine(async_url(DATABASE_URL), echo=DB_ECHO, **_pool_kwargs(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,110 @@
+# app/services/endpointing.py
+import os
+from collections import deque
+
+import numpy as np
+import webrtcvad
+
+VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", "3"))
+ENDPOINT_MIN_SILENCE_MS = float(os.getenv("ENDPOINT_MIN_SILENCE_MS", "700"))
+ENDPOINT_MAX_SILENCE_MS = float(os.getenv("ENDPOINT_MAX_SILENCE_MS", "2500"))
+ENDPOINT_PAUSE_FACTOR = float(os.getenv("ENDPOINT_PAUSE_FACTOR", "1.5"))     # x p90 of the speaker's pauses
+ENDPOINT_SENTENCE_FACTOR = float(os.getenv("ENDPOINT_SENTENCE_FACTOR", "0.6"))  # partial ends in . ? !
+ENDPOINT_MIN_RMS = float(os.getenv("ENDPOINT_MIN_RMS", "200"))               # int16 scale
+ENDPOINT_PREROLL_MS = float(os.getenv("ENDPOINT_PREROLL_MS", "300"))
+ENDPOINT_ONSET_MS = float(os.getenv("ENDPOINT_ONSET_MS", "90"))
+MIN_PAUSE_MS = 150          # shorter gaps are within-word VAD flicker, not pauses
+PAUSE_HISTORY = 50
+
+
+def frame_rms(frame) -> float:
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    if not samples.size:
+        return 0.0
+    return float(np.sqrt(np.dot(samples, samples) / samples.size))
+
+
+class Endpointer:
+    """
+    Per-connection speech segmentation and end-of-turn detection.
+
+    Frames go in one at a time; push() returns the frames to append to the
+    current segment and whether the turn just ended. The silence needed to end
+    a turn adapts to the speaker's own pause lengths and shrinks when the
+    latest partial transcript already ends in a complete sentence.
+    """
+
+    def __init__(self, *, rate: int, frame_ms: int,
+                 aggressiveness: int = VAD_AGGRESSIVENESS,
+                 min_silence_ms: float = ENDPOINT_MIN_SILENCE_MS,
+                 max_silence_ms: float = ENDPOINT_MAX_SILENCE_MS,
+                 pause_factor: float = ENDPOINT_PAUSE_FACTOR,
+                 sentence_factor: float = ENDPOINT_SENTENCE_FACTOR,
+                 min_rms: float = ENDPOINT_MIN_RMS,
+                 preroll_ms: float = ENDPOINT_PREROLL_MS,
+                 onset_ms: float = ENDPOINT_ONSET_MS):
+        self.rate = rate
+        self.frame_ms = frame_ms
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.pause_factor = pause_factor
+        self.sentence_factor = sentence_factor
+        self.min_rms = min_rms
+        self.onset_frames = max(1, int(onset_ms / frame_ms))
+        self.preroll: deque[bytes] = deque(maxlen=max(self.onset_frames, int(preroll_ms / frame_ms)))
+        self.pauses: deque[float] = deque(maxlen=PAUSE_HISTORY)
+        self.hint = ""
+        self.in_speech = False
+        self.silence_ms = 0.0
+        self._run = 0          # consecutive speech frames while idle
+
+    def is_speech(self, frame: bytes) -> bool:
+        return self.vad.is_speech(frame, self.rate) and frame_rms(frame) >= self.min_rms
+
+    def set_hint(self, partial_text: str) -> None:
+        """Latest partial transcript of the current turn."""
+        self.hint = (partial_text or "").rstrip()
+
+    def threshold_ms(self) -> float:
+        """Silence (ms) that currently counts as end of turn."""
+        th = self.max_silence_ms
+        if len(self.pauses) >= 5:
+            p90 = sorted(self.pauses)[int(0.9 * (len(self.pauses) - 1))]
+            th = min(th, p90 * self.pause_factor)
+        if self.hint.endswith((".", "?", "!")):
+            th *= self.sentence_factor
+        return max(self.min_silence_ms, min(self.max_silence_ms, th))
+
+    def push(self, frame: bytes) -> tuple[list[bytes], bool]:
+        speech = self.is_speech(frame)
+
+        if not self.in_speech:
+            self.preroll.append(frame)
+            self._run = self._run + 1 if speech else 0
+            if self._run < self.onset_frames:
+                return [], False
+            out = list(self.preroll)
+            self.preroll.clear()
+            self.in_speech, self.silence_ms, self._run = True, 0.0, 0
+            return out, False
+
+        if speech:
+            if self.silence_ms >= MIN_PAUSE_MS:
+                self.pauses.append(self.silence_ms)
+            self.silence_ms = 0.0
+            return [frame], False
+
+        self.silence_ms += self.frame_ms
+        if self.silence_ms >= self.threshold_ms():
+            self.reset()
+            return [frame], True
+        return [frame], False
+
+    def reset(self) -> None:
+        """Forget the current turn; the learned pause distribution is kept."""
+        self.in_speech = False
+        self.silence_ms = 0.0
+        self.hint = ""
+        self._run = 0
+        self.preroll.clear()
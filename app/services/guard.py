@@ -0,0 +1,156 @@
+# app/services/guard.py
+"""
+Post-transcription guard: decides whether a transcript is worth an LLM call.
+
+Text is normalised (case, punctuation, whitespace) and scanned once with an
+Aho-Corasick automaton compiled from HALLUCINATION_PHRASES, matching on word
+boundaries. A transcript is dropped when it is empty or too short, when known
+filler/hallucination phrases cover most of it, or when Whisper's own segment
+metadata says it probably heard no speech.
+"""
+import os
+import re
+import time
+from collections import deque
+
+GUARD_MIN_CHARS = int(os.getenv("GUARD_MIN_CHARS", "12"))
+GUARD_MIN_WORDS = int(os.getenv("GUARD_MIN_WORDS", "2"))
+GUARD_MAX_PHRASE_COVERAGE = float(os.getenv("GUARD_MAX_PHRASE_COVERAGE", "0.6"))
+GUARD_NO_SPEECH_PROB = float(os.getenv("GUARD_NO_SPEECH_PROB", "0.6"))
+GUARD_MIN_AVG_LOGPROB = float(os.getenv("GUARD_MIN_AVG_LOGPROB", "-1.0"))
+GUARD_MAX_COMPRESSION_RATIO = float(os.getenv("GUARD_MAX_COMPRESSION_RATIO", "2.4"))
+
+HALLUCINATION_PHRASES = [
+    # Short fillers & interjections
+    "um", "uh", "hmm", "hmmm", "mm", "er", "ah", "eh", "huh", "oh", "okay", "ok", "yeah", "so",
+
+    # Common Whisper hallucinations / YouTube-style phrases
+    "thanks for watching",
+    "thank you for watching",
+    "thank you good",
+    "thanks for watching bye",
+    "i'll see you in the next video",
+    "see you in the next video",
+    "see you next time",
+    "thank you very much",
+    "thank you",
+    "please like",
+    "please like share",
+    "please like share subscribe",
+    "like share subscribe",
+    "like and subscribe",
+    "subscribe to my channel",
+    "check out my other videos",
+    "don't forget to like",
+    "don't forget to subscribe",
+    "hit the bell icon",
+    "smash that like button",
+    "follow for more",
+    "follow me for more",
+    "share and subscribe",
+    "and subscribe",
+    "watch my other videos",
+    "watch next video",
+    "watch next",
+    "subtitles by the amara org community",
+    "transcription by castingwords",
+    "bye",
+]
+
+STATS = {"checked": 0, "passed": 0, "dropped": {}, "seconds": 0.0}
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WS_RE.sub(" ", _PUNCT_RE.sub(" ", (text or "").lower())).strip()
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over normalised phrases, matching whole words only."""
+
+    def __init__(self, phrases):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[int] = [0]          # length of the longest phrase ending at this state
+        for p in {normalize(p) for p in phrases if normalize(p)}:
+            self._add(f" {p} ")
+        self._link()
+
+    def _add(self, phrase: str) -> None:
+        s = 0
+        for ch in phrase:
+            nxt = self.goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[s][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(0)
+            s = nxt
+        self.out[s] = max(self.out[s], len(phrase))
+
+    def _link(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, nxt in self.goto[s].items():
+                queue.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = max(self.out[nxt], self.out[self.fail[nxt]])
+
+    def coverage(self, normalized: str) -> float:
+        """Fraction of characters of `normalized` covered by phrase matches."""
+        if not normalized:
+            return 0.0
+        text = f" {normalized} "
+        covered = bytearray(len(text))
+        s = 0
+        for i, ch in enumerate(text):
+            while s and ch not in self.goto[s]:
+                s = self.fail[s]
+            s = self.goto[s].get(ch, 0)
+            if self.out[s]:
+                covered[i - self.out[s] + 1:i + 1] = b"\x01" * self.out[s]
+        # boundary spaces are shared between neighbouring matches; count letters only
+        letters = [i for i, ch in enumerate(text) if ch != " "]
+        return sum(covered[i] for i in letters) / len(letters)
+
+
+_matcher = PhraseMatcher(HALLUCINATION_PHRASES)
+
+
+def check(text: str, meta: dict | None = None) -> str | None:
+    """Reason to drop the transcript, or None when it should be answered."""
+    t0 = time.perf_counter()
+    reason = _check(text, meta or {})
+    STATS["seconds"] += time.perf_counter() - t0
+    STATS["checked"] += 1
+    if reason is None:
+        STATS["passed"] += 1
+    else:
+        STATS["dropped"][reason] = STATS["dropped"].get(reason, 0) + 1
+    return reason
+
+
+def _check(text: str, meta: dict) -> str | None:
+    norm = normalize(text)
+    if not norm:
+        return "empty"
+    if len(norm.split()) < GUARD_MIN_WORDS or len(norm) < GUARD_MIN_CHARS:
+        return "too_short"
+    if _matcher.coverage(norm) >= GUARD_MAX_PHRASE_COVERAGE:
+        return "hallucination_phrase"
+    no_speech = meta.get("no_speech_prob")
+    logprob = meta.get("avg_logprob")
+    if no_speech is not None and logprob is not None \
+            and no_speech > GUARD_NO_SPEECH_PROB and logprob < GUARD_MIN_AVG_LOGPROB:
+        return "no_speech"
+    ratio = meta.get("compression_ratio")
+    if ratio is not None and ratio > GUARD_MAX_COMPRESSION_RATIO:
+        return "repetitive"
+    return None
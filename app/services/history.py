@@ -0,0 +1,153 @@
+# app/services/history.py
+"""
+Keyset-paginated history reads and the per-session summary table.
+
+Pages are ordered by (created_at, id), which the composite
+ix_transcripts_user_session_created index serves directly. The cursor is an
+opaque token encoding the last row's (created_at, id), so each page costs
+the same however deep into a session it is. The sessions list reads
+session_summaries, which save_turn_db keeps up to date, instead of grouping
+every transcript the user ever produced.
+
+Existing databases need the new index and a one-off summary backfill:
+    python -m app.services.history backfill
+"""
+import base64
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from app.services import models
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+
+
+def page_size(limit: int | None) -> int:
+    return max(1, min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE))
+
+
+def encode_cursor(at: datetime, key) -> str:
+    raw = json.dumps([at.isoformat(), str(key)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parse_key=str) -> tuple[datetime, object]:
+    """
+    (timestamp, parse_key(key)) from a cursor; ValueError if it was not made by
+    encode_cursor or the key does not parse (e.g. parse_key=uuid.UUID).
+    """
+    try:
+        at, key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(key, str):
+            raise TypeError("cursor key must be a string")
+        return datetime.fromisoformat(at), parse_key(key)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _upsert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"session_summaries upsert not supported on {dialect_name}")
+    return insert(models.SessionSummary)
+
+
+async def record_turn(db, user_id, session_id: str, at: datetime, turns: int = 1) -> None:
+    """Bump the session's summary row by `turns`; committed together with the turns."""
+    if not session_id:
+        return
+    S = models.SessionSummary
+    dialect = db.bind.dialect.name
+    stmt = _upsert(dialect).values(user_id=user_id, session_id=session_id, turn_count=turns, last_activity=at)
+    latest = sa.func.max if dialect == "sqlite" else sa.func.greatest    # sqlite's two-argument max() is scalar
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "session_id"],
+        set_={"turn_count": S.turn_count + turns,
+              "last_activity": latest(S.last_activity, stmt.excluded.last_activity)},
+    )
+    await db.execute(stmt)
+
+
+def _row_key(at: datetime, row_id) -> tuple:
+    # sqlite hands timestamps back naive; they were written as UTC
+    return (at if at.tzinfo else at.replace(tzinfo=timezone.utc)), row_id
+
+
+async def transcripts_page(db, user_id, session_id: str, *, cursor: str | None = None,
+                           limit: int | None = None, newest_first: bool = False, pending=()):
+    """
+    (rows, next_cursor) of one session's turns; next_cursor is None on the last page.
+    `pending` are rows not committed yet (TurnWriter.pending_rows, taken before
+    this call); they are merged in, so a turn shows up as soon as it is saved.
+    """
+    T = models.Transcript
+    n = page_size(limit)
+    key = sa.tuple_(T.created_at, T.id)
+    q = sa.select(T).where(T.user_id == user_id, T.session_id == session_id)
+    after = None
+    if cursor:
+        at, row_id = decode_cursor(cursor, uuid.UUID)
+        bound = sa.tuple_(sa.literal(at, T.created_at.type), sa.literal(row_id, T.id.type))
+        q = q.where(key < bound if newest_first else key > bound)
+        after = _row_key(at, row_id)
+    order = (T.created_at.desc(), T.id.desc()) if newest_first else (T.created_at.asc(), T.id.asc())
+    rows = (await db.scalars(q.order_by(*order).limit(n + 1))).all()
+    if pending:
+        seen = {r.id for r in rows}
+        extra = [p for p in pending if p.id not in seen and (
+            after is None or (_row_key(p.created_at, p.id) < after if newest_first
+                              else _row_key(p.created_at, p.id) > after))]
+        if extra:
+            rows = sorted([*rows, *extra], key=lambda r: _row_key(r.created_at, r.id), reverse=newest_first)[:n + 1]
+    more = len(rows) > n
+    rows = rows[:n]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id) if more else None
+
+
+async def sessions_page(db, user_id, *, cursor: str | None = None, limit: int | None = None):
+    """(summaries, next_cursor), most recently active first."""
+    S = models.SessionSummary
+    n = page_size(limit)
+    q = sa.select(S).where(S.user_id == user_id)
+    if cursor:
+        at, sid = decode_cursor(cursor)
+        q = q.where(sa.tuple_(S.last_activity, S.session_id)
+                    < sa.tuple_(sa.literal(at, S.last_activity.type), sa.literal(sid)))
+    rows = (await db.scalars(q.order_by(S.last_activity.desc(), S.session_id.desc()).limit(n + 1))).all()
+    more = len(rows) > n
+    rows = rows[:n]
+    return rows, encode_cursor(rows[-1].last_activity, rows[-1].session_id) if more else None
+
+
+def backfill_summaries(db) -> dict:
+    """Create the composite index if missing and rebuild session_summaries from transcripts (sync Session)."""
+    T, S = models.Transcript, models.SessionSummary
+    bind = db.get_bind()
+    for index in T.__table__.indexes | S.__table__.indexes:
+        index.create(bind, checkfirst=True)
+    db.execute(sa.delete(S))
+    db.execute(sa.insert(S).from_select(
+        ["user_id", "session_id", "turn_count", "last_activity"],
+        sa.select(T.user_id, T.session_id, sa.func.count(), sa.func.max(T.created_at))
+        .where(T.session_id.isnot(None), T.session_id != "")
+        .group_by(T.user_id, T.session_id),
+    ))
+    db.commit()
+    return {"sessions": db.scalar(sa.select(sa.func.count()).select_from(S))}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m app.services.history backfill")
+    from app.services.db import SessionLocal, engine, Base
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        print(json.dumps(backfill_summaries(session)))
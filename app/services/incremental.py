@@ -0,0 +1,143 @@
+# app/services/incremental.py
+import asyncio
+import os
+import re
+
+from app.services.audio_gate import trim_for_upload
+from app.services.segment_buffer import SegmentBuffer
+from app.services.transcribe import transcribe_pcm
+
+PARTIAL_CHUNK_SEC = float(os.getenv("PARTIAL_CHUNK_SEC", "4.0"))     # 0 disables partials
+PARTIAL_OVERLAP_SEC = float(os.getenv("PARTIAL_OVERLAP_SEC", "0.6"))
+STITCH_MAX_OVERLAP_WORDS = 8
+
+
+def _norm(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(prev: str, new: str, max_overlap_words: int = STITCH_MAX_OVERLAP_WORDS) -> str:
+    """Join two overlapping chunk transcripts, dropping words repeated across the seam."""
+    a, b = prev.split(), new.split()
+    if not a:
+        return " ".join(b)
+    if not b:
+        return " ".join(a)
+    na, nb = [_norm(w) for w in a], [_norm(w) for w in b]
+    overlap = 0
+    for k in range(min(max_overlap_words, len(a), len(b)), 0, -1):
+        if na[-k:] == nb[:k]:
+            overlap = k
+            break
+    return " ".join(a + b[overlap:])
+
+
+def merge(parts: list[tuple[str, dict]]) -> tuple[str, dict]:
+    """Stitch chunk results; confidence is taken from the chunk that sounded most like speech."""
+    text, metas = "", [m for _, m in parts if m]
+    for part, _ in parts:
+        text = stitch(text, (part or "").strip())
+    meta = {}
+    if metas:
+        meta = {
+            "no_speech_prob": min(m["no_speech_prob"] for m in metas),
+            "avg_logprob": max(m["avg_logprob"] for m in metas),
+            "compression_ratio": max(m["compression_ratio"] for m in metas),
+        }
+    return text, meta
+
+
+async def _concat(parts) -> tuple[str, dict]:
+    return merge(await asyncio.gather(*parts))
+
+
+def join_transcripts(head, tail):
+    """Awaitable (text, meta) of `head` followed by `tail`; `head` may be None."""
+    if head is None:
+        return tail
+    return asyncio.ensure_future(_concat([head, tail]))
+
+
+def _trim_and_transcribe(pcm: bytes) -> tuple[str, dict]:
+    pcm = trim_for_upload(pcm)      # NumPy feature pass: off the event loop like the upload
+    if pcm is None:
+        return "", {}
+    return transcribe_pcm(pcm)
+
+
+class IncrementalTranscriber:
+    """
+    Transcribes a growing speech segment in overlapping chunks while it is still
+    being spoken, so only the short tail is left to transcribe at end of turn.
+    """
+
+    def __init__(self, *, frame_ms: int,
+                 chunk_sec: float = PARTIAL_CHUNK_SEC,
+                 overlap_sec: float = PARTIAL_OVERLAP_SEC):
+        self.chunk_frames = int(chunk_sec * 1000 / frame_ms) if chunk_sec > 0 else 0
+        self.overlap_frames = int(overlap_sec * 1000 / frame_ms)
+        self._committed = 0          # frames of the segment already handed to a chunk
+        self._tasks: list[asyncio.Future] = []
+        self.latest = ""             # stitched text of the chunks finished so far
+
+    def transcribe(self, pcm) -> asyncio.Future:
+        """Trim silence, encode and upload in a worker thread; chunks with no speech never leave the box."""
+        return asyncio.create_task(asyncio.to_thread(_trim_and_transcribe, pcm))
+
+    def _submit(self, segment: SegmentBuffer, end: int) -> None:
+        start = max(0, self._committed - self.overlap_frames)
+        task = self.transcribe(segment.pcm(start, end))
+        task.add_done_callback(self._on_chunk_done)
+        self._tasks.append(task)
+        self._committed = end
+
+    def _on_chunk_done(self, _task: asyncio.Future) -> None:
+        text = ""
+        for t in self._tasks:
+            if not t.done() or t.cancelled() or t.exception():
+                break
+            text = stitch(text, (t.result()[0] or "").strip())
+        self.latest = text
+
+    def on_frames(self, segment: SegmentBuffer) -> None:
+        """Call after appending to the segment; ships a chunk once enough new speech is buffered."""
+        if self.chunk_frames and len(segment) - self._committed >= self.chunk_frames:
+            self._submit(segment, len(segment))
+
+    async def peek(self, segment: SegmentBuffer, end: int) -> str:
+        """(text, meta) of the first `end` frames of the segment, without committing the tail."""
+        tasks = [asyncio.shield(t) for t in self._tasks]
+        if end > self._committed:
+            start = max(0, self._committed - self.overlap_frames)
+            tasks.append(self.transcribe(segment.pcm(start, end)))
+        return merge(await asyncio.gather(*tasks))
+
+    def finish(self, segment: SegmentBuffer) -> asyncio.Future:
+        """
+        Hand off a finished segment: ships the remaining tail now, resets for the
+        next segment and returns a future with the stitched (text, meta).
+        """
+        if len(segment) > self._committed:
+            self._submit(segment, len(segment))
+        tasks = self._tasks
+        self.reset()
+        return asyncio.ensure_future(self._collect(tasks, segment))
+
+    async def _collect(self, tasks: list[asyncio.Future], segment: SegmentBuffer) -> tuple[str, dict]:
+        try:
+            parts = await asyncio.gather(*tasks)
+        except Exception as e:
+            print("[partials] chunk failed, retrying whole segment:", e)
+            for t in tasks:
+                t.cancel()
+            return await self.transcribe(segment.pcm())
+        return merge(parts)
+
+    def reset(self) -> None:
+        """Start a new segment; chunks already in flight are left to finish."""
+        self._tasks, self._committed, self.latest = [], 0, ""
+
+    def cancel(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self._tasks, self._committed, self.latest = [], 0, ""
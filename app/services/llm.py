@@ -1,5 +1,4 @@
-import openai
-import os
+from app.services.clients import get_openai_client, get_async_openai_client
 
 
 def get_llm_response(messages, *,
@@ -8,7 +7,7 @@ def get_llm_response(messages, *,
                      top_p=1.0,
                      stream=False):
    
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_openai_client()
     response = client.chat.completions.create(
         model=model,
         temperature=temperature,
@@ -24,4 +23,29 @@ def get_llm_response(messages, *,
                 yield chunk.choices[0].delta.content
     else:
         # Return full response for non-streaming
-        return response.choices[0].message.content
\ No newline at end of file
+        return response.choices[0].message.content
+
+
+async def stream_llm_response(messages, *,
+                              model="gpt-4.1-mini",
+                              temperature=0.4,
+                              top_p=1.0):
+    """
+    Async counterpart of get_llm_response(stream=True).
+    Yields content tokens without blocking the event loop between chunks.
+    """
+    client = get_async_openai_client()
+    response = await client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        top_p=top_p,
+        messages=messages,
+        stream=True
+    )
+    try:
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # closing the stream aborts the upstream request when the consumer is cancelled
+        await response.close()
@@ -0,0 +1,234 @@
+# app/services/metrics.py
+"""
+Per-turn stage timings and the Prometheus text exposition behind /metrics.
+
+Every turn carries a TurnTrace whose clock starts at the end of speech (the
+last voiced frame). Stages are marked with time.monotonic() as the turn
+goes through the app:
+
+    speculated      a speculative answer was started on a probable end of turn
+    end_detected    the endpointer (or the segment cap) closed the segment
+    audio_encoded   the tail chunk was encoded for upload
+    asr_request / asr_response
+    transcribed     all chunks back and stitched
+    guard           guard decision made
+    context_loaded  profile and history loaded (cache or DB)
+    prompt_built
+    first_token / last_token   as relayed to the client
+    saved           handed to the write-behind writer
+
+Code that runs inside a turn (including worker threads started from it)
+finds the trace through a context variable, so mark() works without
+threading it through every call. When the turn ends, the trace is turned
+into histogram observations and a JSON record; the last TRACE_KEEP records
+are served by /metrics/turns, and TRACE_LOG=1 also prints each one.
+
+Profilers can subscribe with add_hook(fn), or via TRACE_HOOKS="pkg.mod:fn,...";
+fn(trace, stage, t) is called for every mark and once more with stage
+"finish" when the turn ends.
+
+Values are per worker process.
+"""
+import contextlib
+import contextvars
+import importlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "200"))
+TRACE_HOOKS = os.getenv("TRACE_HOOKS", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None    # if set, /metrics wants "Authorization: Bearer <token>"
+PREFIX = "audio_agent"
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+# per-turn intervals between marks, observed into stage_seconds
+SPANS = {
+    "asr_wait": ("end_detected", "transcribed"),
+    "guard": ("transcribed", "guard"),
+    "context": ("guard", "context_loaded"),
+    "prompt": ("context_loaded", "prompt_built"),
+    "llm_first_token": ("prompt_built", "first_token"),
+    "llm_stream": ("first_token", "last_token"),
+    "save": ("last_token", "saved"),
+}
+
+STATS = {"outcomes": {}}       # finished turns by outcome
+
+current_trace: contextvars.ContextVar = contextvars.ContextVar("turn_trace", default=None)
+_hooks: list = []
+_sources: dict[str, dict] = {}
+_recent: deque = deque(maxlen=TRACE_KEEP)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series: dict[str, list] = {}      # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()           # observed from worker threads too
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            s = self._series.get(label_value)
+            if s is None:
+                s = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def summary(self) -> dict[str, dict]:
+        """{label value: {"count", "sum"}} for in-process consumers (the load test)."""
+        with self._lock:
+            return {k: {"count": v[-1], "sum": v[-2]} for k, v in self._series.items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for value, s in sorted(series.items()):
+            lbl = f'{self.label}="{value}"'
+            for le, n in zip(self.buckets, s):
+                lines.append(f'{self.name}_bucket{{{lbl},le="{le}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{lbl},le="+Inf"}} {s[-1]}')
+            lines.append(f"{self.name}_sum{{{lbl}}} {s[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{lbl}}} {s[-1]}")
+        return lines
+
+
+turn_seconds = Histogram("turn_seconds", "Time from end of speech to each turn stage.", "stage")
+stage_seconds = Histogram("stage_seconds", "Duration of individual stages.", "stage")
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    stage_seconds.observe(stage, seconds)
+
+
+class TurnTrace:
+    __slots__ = ("id", "t0", "marks", "info", "outcome")
+
+    def __init__(self, speech_end: float | None = None, **info):
+        self.id = uuid.uuid4().hex[:12]
+        self.t0 = time.monotonic() if speech_end is None else speech_end
+        self.marks: dict[str, float] = {}
+        self.info = info
+        self.outcome = None
+
+    def mark(self, stage: str, t: float | None = None) -> None:
+        """Record a stage; the first mark of a stage wins."""
+        if self.outcome is not None or stage in self.marks:
+            return
+        t = time.monotonic() if t is None else t
+        self.marks[stage] = t
+        for hook in _hooks:
+            try:
+                hook(self, stage, t)
+            except Exception as e:
+                print("[metrics] hook failed:", e)
+
+    def finish(self, outcome: str) -> dict | None:
+        """Close the trace (answered, dropped, skipped, cancelled, error); later calls are ignored."""
+        if self.outcome is not None:
+            return None
+        self.outcome = outcome
+        STATS["outcomes"][outcome] = STATS["outcomes"].get(outcome, 0) + 1
+        for stage, t in self.marks.items():
+            if t >= self.t0:
+                turn_seconds.observe(stage, t - self.t0)
+        for span, (a, b) in SPANS.items():
+            if a in self.marks and b in self.marks and self.marks[b] >= self.marks[a]:
+                stage_seconds.observe(span, self.marks[b] - self.marks[a])
+        record = self.record()
+        _recent.append(record)
+        if TRACE_LOG:
+            print("[trace]", json.dumps(record, separators=(",", ":")))
+        for hook in _hooks:
+            try:
+                hook(self, "finish", time.monotonic())
+            except Exception as e:
+                print("[metrics] hook failed:", e)
+        return record
+
+    def record(self) -> dict:
+        ms = {s: round(1000 * (t - self.t0), 1) for s, t in sorted(self.marks.items(), key=lambda kv: kv[1])}
+        return {"id": self.id, "outcome": self.outcome, **self.info, "ms_since_speech_end": ms}
+
+
+def mark(stage: str, t: float | None = None) -> None:
+    """Mark a stage on the current turn, if there is one."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.mark(stage, t)
+
+
+@contextlib.contextmanager
+def tracing(trace: TurnTrace | None):
+    """Tasks and threads started inside this block belong to `trace`."""
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def add_hook(fn) -> None:
+    _hooks.append(fn)
+
+
+def recent_turns() -> list[dict]:
+    return list(_recent)
+
+
+def register_stats(name: str, stats: dict) -> None:
+    """Export a module's STATS dict: numbers as gauges, one level of nested dicts as labelled series."""
+    _sources[name] = stats
+
+
+def _metric_name(*parts) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(str(p) for p in parts))
+
+
+def _number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    lines = []
+    for hist in (turn_seconds, stage_seconds):
+        lines += hist.render()
+    for source, stats in sorted(_sources.items()):
+        for key, value in list(stats.items()):
+            name = _metric_name(PREFIX, source, key)
+            if _number(value):
+                lines += [f"# TYPE {name} untyped", f"{name} {value}"]
+            elif isinstance(value, dict):
+                series = [(k, v) for k, v in list(value.items()) if _number(v)]
+                if series:
+                    lines.append(f"# TYPE {name} untyped")
+                    lines += [f'{name}{{key="{_escape(k)}"}} {v}' for k, v in series]
+    return "\n".join(lines) + "\n"
+
+
+register_stats("turns", STATS)
+
+for _spec in filter(None, (s.strip() for s in TRACE_HOOKS.split(","))):
+    try:
+        _module, _fn = _spec.split(":")
+        add_hook(getattr(importlib.import_module(_module), _fn))
+    except Exception as e:
+        print(f"[metrics] could not load trace hook {_spec!r}:", e)
@@ -12,7 +12,7 @@ class User(Base):
     email = sa.Column(sa.String, unique=True, nullable=False, index=True)
     password_hash = sa.Column(sa.String, nullable=False)
     is_active = sa.Column(sa.Boolean, server_default=sa.text("true"))
-    created_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"))
+    created_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.func.now())
 
 class Transcript(Base):
     __tablename__ = "transcripts"
@@ -31,15 +31,39 @@ class Transcript(Base):
     assistant_text = sa.Column(sa.Text) 
     tokens = sa.Column(sa.Integer, server_default=sa.text("0"))
     meta = sa.Column(sa.JSON)
-    created_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"))
+    created_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.func.now())
 
     user = relationship("User", backref="transcripts")
 
+    __table_args__ = (
+        # serves the per-session history queries and their keyset cursors
+        sa.Index("ix_transcripts_user_session_created", "user_id", "session_id", "created_at", "id"),
+    )
+
 class UserProfile(Base):
     __tablename__ = "user_profiles"
     user_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     resume = sa.Column(sa.Text)
     projects = sa.Column(sa.Text)
     job_description = sa.Column(sa.Text)
-    updated_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), onupdate=sa.text("now()"))
+    updated_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now())
+
+class PromptPart(Base):
+    """Content-addressed prompt fragment (system template, profile snapshot, turn template)."""
+    __tablename__ = "prompt_parts"
+    hash = sa.Column(sa.String(64), primary_key=True)   # sha256 hex of content
+    kind = sa.Column(sa.String, nullable=False)
+    content = sa.Column(sa.Text, nullable=False)
+    created_at = sa.Column(sa.TIMESTAMP(timezone=True), server_default=sa.func.now())
 
+class SessionSummary(Base):
+    """One row per (user, session), maintained on every saved turn."""
+    __tablename__ = "session_summaries"
+    user_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    session_id = sa.Column(sa.String, primary_key=True)
+    turn_count = sa.Column(sa.Integer, nullable=False, server_default=sa.text("0"))
+    last_activity = sa.Column(sa.TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        sa.Index("ix_session_summaries_user_activity", "user_id", "last_activity", "session_id"),
+    )
@@ -0,0 +1,328 @@
+# app/services/persistence.py
+"""
+Write-behind persistence for turns and speech segments.
+
+Saved turns go onto a queue and a single writer task commits them in
+batches: it waits PERSIST_FLUSH_MS after the first queued turn, then inserts
+everything waiting (up to PERSIST_BATCH_MAX) together with their prompt parts
+and session summary bumps in one transaction. The answer path only waits
+when the queue is full. If a batch fails its turns are retried one per
+transaction, so a bad row costs only itself. Turns still waiting are served
+by pending() to history loads that miss the context cache, and by
+pending_rows() to the history endpoints.
+
+Segment WAVs are written to SEGMENTS_DIR by a second task, in a worker
+thread. Once more than SEGMENTS_ROTATE_MB has been written there, the files
+are moved into a timestamped directory under RECORDINGS_DIR, and the oldest
+of those are deleted past RECORDINGS_KEEP_MB or RECORDINGS_KEEP_DAYS.
+Segments are best-effort: when that queue is full they are dropped and
+counted.
+
+close() drains both queues (up to PERSIST_DRAIN_SEC); the app calls it on
+shutdown. Queue depth, flush latency and time-to-commit are in STATS.
+"""
+import asyncio
+import contextlib
+import os
+import re
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import sqlalchemy as sa
+
+from app.services import metrics, models
+from app.services.cluster import invalidations
+from app.services.db import AsyncSessionLocal
+from app.services.history import record_turn
+from app.services.provenance import remember_parts, store_parts
+
+_BASE = Path(__file__).resolve().parents[2]
+
+PERSIST_FLUSH_MS = float(os.getenv("PERSIST_FLUSH_MS", "250"))
+PERSIST_BATCH_MAX = int(os.getenv("PERSIST_BATCH_MAX", "200"))
+PERSIST_QUEUE_MAX = int(os.getenv("PERSIST_QUEUE_MAX", "10000"))
+PERSIST_DRAIN_SEC = float(os.getenv("PERSIST_DRAIN_SEC", "30"))
+
+SAVE_SEGMENTS = os.getenv("SAVE_SEGMENTS", "1") == "1"
+SEGMENTS_DIR = Path(os.getenv("SEGMENTS_DIR", str(_BASE / "segments")))
+RECORDINGS_DIR = Path(os.getenv("RECORDINGS_DIR", str(_BASE / "data" / "recordings")))
+SEGMENTS_ROTATE_MB = float(os.getenv("SEGMENTS_ROTATE_MB", "256"))
+RECORDINGS_KEEP_MB = float(os.getenv("RECORDINGS_KEEP_MB", "4096"))
+RECORDINGS_KEEP_DAYS = float(os.getenv("RECORDINGS_KEEP_DAYS", "14"))     # 0 keeps them regardless of age
+SEGMENT_QUEUE_MAX = int(os.getenv("SEGMENT_QUEUE_MAX", "256"))
+
+STATS = {
+    "queue_depth": 0,           # turns waiting to be written (gauge)
+    "max_queue_depth": 0,
+    "enqueued": 0,
+    "written": 0,
+    "failed": 0,                # turns dropped after their own retry failed
+    "batches": 0,
+    "last_batch": 0,
+    "last_flush_ms": 0.0,       # one batch's transaction
+    "max_flush_ms": 0.0,
+    "flush_ms_total": 0.0,
+    "max_commit_lag_ms": 0.0,   # from save_turn_db to the turn's commit
+    "segments_queued": 0,       # gauge
+    "segments_written": 0,
+    "segments_dropped": 0,
+    "segment_bytes": 0,
+    "rotations": 0,
+    "recordings_deleted": 0,
+}
+
+_STOP = object()
+_BATCH_NAME = re.compile(r"^\d{8}T\d{6}Z(-\d+)?$")
+
+
+def _turn_row(turn: dict) -> dict:
+    return {k: turn[k] for k in ("id", "user_id", "session_id", "text", "assistant_text", "tokens", "meta", "created_at")}
+
+
+async def write_turns(db, turns: list[dict]) -> None:
+    """Insert turns, their prompt parts and session summary bumps in one transaction."""
+    parts = {}
+    for turn in turns:
+        parts.update(turn.get("parts") or {})
+    stored = await store_parts(db, parts) if parts else []
+    await db.execute(sa.insert(models.Transcript), [_turn_row(t) for t in turns])
+    sessions = defaultdict(list)
+    for turn in turns:
+        sessions[(turn["user_id"], turn["session_id"])].append(turn["created_at"])
+    for (user_id, session_id), times in sessions.items():
+        await record_turn(db, user_id, session_id, max(times), len(times))
+    await db.commit()
+    remember_parts(stored)      # not before: a rolled-back batch must insert them again on retry
+
+
+class TurnWriter:
+    def __init__(self, *, flush_ms: float = PERSIST_FLUSH_MS, batch_max: int = PERSIST_BATCH_MAX,
+                 maxsize: int = PERSIST_QUEUE_MAX, session_factory=AsyncSessionLocal):
+        self.flush_ms = flush_ms
+        self.batch_max = batch_max
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._pending: dict = {}        # id -> turn, until committed
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, turn: dict) -> None:
+        """Queue a turn (the keys of a Transcript row plus optional "parts")."""
+        turn["_queued"] = time.monotonic()
+        STATS["enqueued"] += 1
+        if self._task is None or self._task.done():
+            await self._flush([turn])       # not started yet, or already drained: write it now
+            return
+        self._pending[turn["id"]] = turn
+        await self._queue.put(turn)
+        STATS["queue_depth"] += 1
+        STATS["max_queue_depth"] = max(STATS["max_queue_depth"], self._queue.qsize())
+
+    def _session_turns(self, user_id, session_id) -> list[dict]:
+        return [t for t in self._pending.values()
+                if str(t["user_id"]) == str(user_id) and t["session_id"] == session_id]
+
+    def pending(self, user_id, session_id) -> list[dict]:
+        """Not yet committed turns of a session as history dicts, newest first."""
+        return [{"timestamp": t["created_at"].isoformat(), "user": t["text"] or "",
+                 "assistant": t["assistant_text"] or "", "id": str(t["id"])}
+                for t in sorted(self._session_turns(user_id, session_id), key=lambda t: t["created_at"], reverse=True)]
+
+    def pending_rows(self, user_id, session_id) -> list[models.Transcript]:
+        """Not yet committed turns of a session as transient Transcript rows, for history pages."""
+        return [models.Transcript(**_turn_row(t)) for t in self._session_turns(user_id, session_id)]
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            if self.flush_ms > 0 and not self._closing.is_set():
+                with contextlib.suppress(asyncio.TimeoutError):     # let the batch fill
+                    await asyncio.wait_for(self._closing.wait(), self.flush_ms / 1000)
+            while len(batch) < self.batch_max and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            STATS["queue_depth"] -= len(batch)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]) -> None:
+        t0 = time.monotonic()
+        try:
+            async with self.session_factory() as db:
+                await write_turns(db, batch)
+            saved = batch
+        except Exception as e:
+            print(f"[persist] batch of {len(batch)} failed, retrying one by one:", e)
+            saved = []
+            for turn in batch:
+                try:
+                    async with self.session_factory() as db:
+                        await write_turns(db, [turn])
+                    saved.append(turn)
+                except Exception as e:
+                    STATS["failed"] += 1
+                    print(f"[persist] turn {turn['id']} dropped:", e)
+        now = time.monotonic()
+        ms = 1000 * (now - t0)
+        STATS["batches"] += 1
+        STATS["last_batch"] = len(batch)
+        STATS["written"] += len(saved)
+        STATS["last_flush_ms"] = ms
+        STATS["max_flush_ms"] = max(STATS["max_flush_ms"], ms)
+        STATS["flush_ms_total"] += ms
+        metrics.observe_stage("db_flush", ms / 1000)
+        STATS["max_commit_lag_ms"] = max(STATS["max_commit_lag_ms"],
+                                         max(1000 * (now - t["_queued"]) for t in batch))
+        for turn in batch:
+            self._pending.pop(turn["id"], None)
+        for user_id, session_id in {(t["user_id"], t["session_id"]) for t in saved}:
+            await invalidations.publish("session", user_id, session_id)
+
+    async def close(self, timeout: float = PERSIST_DRAIN_SEC) -> None:
+        if self._task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._queue.put(_STOP), timeout)
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            print(f"[persist] drain timed out; {self._queue.qsize()} turns not written")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class SegmentWriter:
+    def __init__(self, directory: Path = SEGMENTS_DIR, archive: Path = RECORDINGS_DIR, *,
+                 rotate_mb: float = SEGMENTS_ROTATE_MB, keep_mb: float = RECORDINGS_KEEP_MB,
+                 keep_days: float = RECORDINGS_KEEP_DAYS, maxsize: int = SEGMENT_QUEUE_MAX):
+        self.directory = Path(directory)
+        self.archive = Path(archive)
+        self.rotate_bytes = int(rotate_mb * 2**20)
+        self.keep_bytes = int(keep_mb * 2**20)
+        self.keep_days = keep_days
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._size = 0
+        self._seq = 0
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            await asyncio.to_thread(self._scan)
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, session_id: str, wav) -> str | None:
+        """Queue one segment's WAV (bytes or memoryview, not modified afterwards); returns its file name."""
+        if self._task is None:
+            return None
+        self._seq += 1
+        sid = re.sub(r"[^A-Za-z0-9_-]", "", session_id or "")[:64] or "nosession"
+        name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}_{os.getpid()}_{self._seq}_{sid}.wav"
+        try:
+            self._queue.put_nowait((name, wav))
+        except asyncio.QueueFull:
+            STATS["segments_dropped"] += 1
+            return None
+        STATS["segments_queued"] += 1
+        return name
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            STATS["segments_queued"] -= 1
+            try:
+                await asyncio.to_thread(self._write, *item)
+            except Exception as e:
+                print("[persist] segment write failed:", e)
+
+    def _write(self, name: str, wav) -> None:
+        (self.directory / name).write_bytes(wav)
+        self._size += len(wav)
+        STATS["segments_written"] += 1
+        STATS["segment_bytes"] += len(wav)
+        if self._size >= self.rotate_bytes:
+            self._rotate()
+
+    def _scan(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.archive.mkdir(parents=True, exist_ok=True)
+        self._size = sum(f.stat().st_size for f in self.directory.glob("*.wav"))
+        if self._size >= self.rotate_bytes:
+            self._rotate()
+        else:
+            self._retain()
+
+    def _rotate(self) -> None:
+        stamp = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+        batch = self.archive / stamp
+        n = 0
+        while batch.exists():
+            n += 1
+            batch = self.archive / f"{stamp}-{n}"
+        batch.mkdir(parents=True)
+        for f in self.directory.glob("*.wav"):
+            try:
+                f.rename(batch / f.name)
+            except FileNotFoundError:       # another worker rotated it first
+                pass
+        self._size = 0
+        STATS["rotations"] += 1
+        self._retain()
+
+    def _retain(self) -> None:
+        batches = sorted(d for d in self.archive.iterdir() if d.is_dir() and _BATCH_NAME.match(d.name))
+        sizes = {d: sum(f.stat().st_size for f in d.glob("*.wav")) for d in batches}
+        total = sum(sizes.values())
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+        for d in batches:
+            too_old = self.keep_days > 0 and \
+                datetime.strptime(d.name[:16], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc) < cutoff
+            if not too_old and total <= self.keep_bytes:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= sizes[d]
+            STATS["recordings_deleted"] += 1
+
+    async def close(self, timeout: float = PERSIST_DRAIN_SEC) -> None:
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(_STOP), timeout)
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            print(f"[persist] segment drain timed out; {self._queue.qsize()} segments not written")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+turn_writer = TurnWriter()
+segment_writer = SegmentWriter()
+
+
+async def start() -> None:
+    turn_writer.start()
+    if SAVE_SEGMENTS:
+        await segment_writer.start()
+
+
+async def close() -> None:
+    await turn_writer.close()
+    await segment_writer.close()
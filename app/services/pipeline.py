@@ -0,0 +1,113 @@
+# app/services/pipeline.py
+import asyncio
+import os
+
+TURN_QUEUE_MAX = int(os.getenv("TURN_QUEUE_MAX", "2"))
+CANCEL_STALE_ANSWERS = os.getenv("CANCEL_STALE_ANSWERS", "1") == "1"
+
+STATS = {
+    "queued": 0,        # segments waiting across all connections (gauge)
+    "max_queued": 0,    # deepest single-connection queue seen
+    "enqueued": 0,
+    "completed": 0,
+    "failed": 0,
+    "dropped": 0,       # evicted from a full queue before being answered
+    "cancelled": 0,     # answers superseded by a newer question
+}
+
+_STOP = object()
+
+
+class TurnPipeline:
+    """
+    Per-connection turn queue with a single worker task.
+
+    The WebSocket receive loop calls submit() and keeps reading frames while
+    the worker transcribes and answers. The queue is bounded: when it is full
+    the oldest waiting segment is dropped. With cancel_stale, supersede()
+    cancels the answers to older segments (streaming or still queued); the
+    caller invokes it once the newer segment turned out to be a question, so
+    a dropped filler ("okay, yeah") never cuts off a real answer.
+    """
+
+    def __init__(self, handler, *, maxsize: int = TURN_QUEUE_MAX,
+                 cancel_stale: bool = CANCEL_STALE_ANSWERS, on_drop=None):
+        self._handler = handler
+        self._on_drop = on_drop
+        self.cancel_stale = cancel_stale
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._current: asyncio.Task | None = None
+        self._current_ticket = 0
+        self._tickets = 0
+        self._stale_before = 0      # jobs with a lower ticket are no longer wanted
+        self._worker = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, job) -> int:
+        """Queue a job; returns its ticket for supersede()."""
+        if self._queue.full():
+            _, dropped = self._queue.get_nowait()
+            STATS["queued"] -= 1
+            STATS["dropped"] += 1
+            if self._on_drop is not None:
+                self._on_drop(dropped)
+        self._tickets += 1
+        self._queue.put_nowait((self._tickets, job))
+        STATS["queued"] += 1
+        STATS["enqueued"] += 1
+        STATS["max_queued"] = max(STATS["max_queued"], self._queue.qsize())
+        return self._tickets
+
+    def supersede(self, ticket: int) -> None:
+        """The job with this ticket is a new question: cancel the answers to every older job."""
+        if not self.cancel_stale:
+            return
+        self._stale_before = max(self._stale_before, ticket)
+        if self._current is not None and not self._current.done() and self._current_ticket < ticket:
+            self._current.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            STATS["queued"] -= 1
+            ticket, job = item
+            if ticket < self._stale_before:
+                STATS["cancelled"] += 1
+                if self._on_drop is not None:
+                    self._on_drop(job)
+                continue
+            self._current_ticket = ticket
+            self._current = asyncio.create_task(self._handler(job))
+            try:
+                # asyncio.wait does not cancel the handler if it is itself cancelled
+                await asyncio.wait({self._current})
+            except asyncio.CancelledError:
+                self._current.cancel()
+                raise
+            if self._current.cancelled():
+                STATS["cancelled"] += 1
+            elif self._current.exception() is not None:
+                STATS["failed"] += 1
+                print("[pipeline] turn failed:", self._current.exception())
+            else:
+                STATS["completed"] += 1
+
+    async def close(self) -> None:
+        """Answer whatever is still queued, then stop the worker."""
+        await self._queue.put(_STOP)
+        await self._worker
+
+    def cancel(self) -> None:
+        """Stop immediately, dropping queued segments and the in-flight answer."""
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                STATS["queued"] -= 1
+                if self._on_drop is not None:
+                    self._on_drop(item[1])
+        self._worker.cancel()
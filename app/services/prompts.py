@@ -1,6 +1,20 @@
 # app/services/prompts.py
+from functools import lru_cache
 from pathlib import Path
 import json
+import os
+
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("o200k_base")
+except Exception:          # optional: fall back to a ~4 chars/token estimate
+    _ENC = None
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_PROFILE_TOKENS = int(os.getenv("PROMPT_PROFILE_TOKENS", "4000"))
+PROMPT_TURN_RESERVE_TOKENS = int(os.getenv("PROMPT_TURN_RESERVE_TOKENS", "1500"))   # kept free for the turn message
+PROMPT_CLIP_TOKENS = int(os.getenv("PROMPT_CLIP_TOKENS", "60"))     # old answers are cut to this
+MESSAGE_OVERHEAD_TOKENS = 4
 
 SYSTEM_TEMPLATE = """You are my voice in a job interview.
 Speak in the first person (“I”) in a natural, conversational style — like I’m talking to a technical teammate.
@@ -45,39 +59,161 @@ If earlier content conflicts with later content, prefer the most recent messages
 """
 
 
-# new one 
-def build_messages_from_db(resume: str, projects: str, job_description: str,
-                           history: list[dict], transcript: str, max_turns: int = 5) -> list[dict]:
+PROFILE_TEMPLATE = (
+    "HERE IS MY RESUME\n{resume}\n\n"
+    "HERE IS MY PROJECTS\n{projects}\n\n"
+    "HERE IS MY JOB_DESCRIPTION\n{job_description}"
+)
+
+TURN_TEMPLATE = (
+    "Answer the interviewer’s latest question based on this transcript.\n\n"
+    "TRANSCRIPT:\n{transcript}\n\n"
+    "[OUTPUT_INSTRUCTIONS]\n"
+    "- Speak as me, in first person.\n"
+    "- Match the interviewer’s ask for depth: one-liner when sufficient; detailed steps/code when they ask “how exactly.\n"
+    "- If technical: include exact libraries/tools and at least one concrete parameter or config; show a tiny code or pseudo-code snippet if it clarifies the “how”.\n"
+    "- Do not force project stories unless explicitly asked for an example. Use STAR only for example-seeking questions.\n"
+    "- Do not repeat the exact same story or phrasing in back-to-back answers.\n"
+    "- Be specific. If a detail is unknown, say so briefly and keep it realistic.\n"
+    "- When natural, close with a one-line takeaway that ties the answer back to the role, the skill, or a lesson learned — vary the phrasing to avoid repetition.\n"
+)
+
+EXCERPTS_TEMPLATE = "THE PARTS OF MY PROFILE MOST RELEVANT TO THIS QUESTION\n{excerpts}\n\n"
+
+
+def turn_message(transcript: str, excerpts: str = "", template: str = TURN_TEMPLATE) -> str:
+    """The final, per-turn user message; retrieved profile excerpts go here so the prefix stays stable."""
+    final = template.format(transcript=transcript)
+    return EXCERPTS_TEMPLATE.format(excerpts=excerpts) + final if excerpts else final
 
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENC is not None:
+        return _ENC.decode(_ENC.encode(text, disallowed_special=())[:max_tokens]).rstrip() + "…"
+    return text[:max_tokens * 4].rstrip() + "…"
+
+
+def recent_turns(history: list[dict], max_turns: int = 5) -> list[dict]:
+    """Oldest → newest slice of a newest-first history that goes into the prompt."""
     ordered = list(reversed(history)) if history else []
-    hist = ordered[-max_turns:] 
-
-    messages = [{"role": "system", "content": SYSTEM_TEMPLATE}]
-    messages.append({"role": "user", "content":
-        f"HERE IS MY RESUME\n{resume or ''}\n\n"
-        f"HERE IS MY PROJECTS\n{projects or ''}\n\n"
-        f"HERE IS MY JOB_DESCRIPTION\n{job_description or ''}"
-    })
-    for turn in hist:
+    return ordered[-max_turns:]
+
+
+def history_messages(turns: list[dict], clipped: int = 0, clip: int = PROMPT_CLIP_TOKENS) -> list[dict]:
+    """Chat messages for oldest → newest turns; the first `clipped` answers are cut to `clip` tokens."""
+    messages = []
+    for i, turn in enumerate(turns):
         u = (turn.get("user") or "").strip()
         a = (turn.get("assistant") or "").strip()
+        if i < clipped:
+            a = clip_tokens(a, clip)
         if u: messages.append({"role": "user", "content": u})
         if a: messages.append({"role": "assistant", "content": a})
-    messages.append({"role": "user", "content":
-        "Answer the interviewer’s latest question based on this transcript.\n\n"
-        f"TRANSCRIPT:\n{transcript}\n\n"
-        "[OUTPUT_INSTRUCTIONS]\n"
-        "- Speak as me, in first person.\n"
-        "- Match the interviewer’s ask for depth: one-liner when sufficient; detailed steps/code when they ask “how exactly.\n"
-        "- If technical: include exact libraries/tools and at least one concrete parameter or config; show a tiny code or pseudo-code snippet if it clarifies the “how”.\n"
-        "- Do not force project stories unless explicitly asked for an example. Use STAR only for example-seeking questions.\n"
-        "- Do not repeat the exact same story or phrasing in back-to-back answers.\n"
-        "- Be specific. If a detail is unknown, say so briefly and keep it realistic.\n"
-        "- When natural, close with a one-line takeaway that ties the answer back to the role, the skill, or a lesson learned — vary the phrasing to avoid repetition.\n"
-    })
     return messages
 
 
+def _messages_tokens(messages: list[dict]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+@lru_cache(maxsize=256)
+def profile_block(resume: str, projects: str, job_description: str,
+                  max_tokens: int = PROMPT_PROFILE_TOKENS) -> tuple[str, int]:
+    """
+    Profile message and its token count. Sections are truncated by water-filling
+    (short sections stay whole, long ones share the rest), depending only on the
+    profile itself so the system+profile prefix is byte-identical across turns
+    and provider-side prompt caching keeps hitting.
+    """
+    sections = [resume or "", projects or "", job_description or ""]
+    sizes = [count_tokens(t) for t in sections]
+    room = max_tokens - count_tokens(PROFILE_TEMPLATE.format(resume="", projects="", job_description=""))
+    if sum(sizes) > room:
+        caps, left, pending = [0, 0, 0], room, sorted(range(3), key=lambda i: sizes[i])
+        while pending:
+            share = max(0, left // len(pending))
+            i = pending.pop(0)
+            caps[i] = min(sizes[i], share)
+            left -= caps[i]
+        sections = [clip_tokens(t, c) if c < n else t for t, c, n in zip(sections, caps, sizes)]
+    content = PROFILE_TEMPLATE.format(resume=sections[0], projects=sections[1], job_description=sections[2])
+    return content, count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+_SYSTEM_TOKENS = count_tokens(SYSTEM_TEMPLATE) + MESSAGE_OVERHEAD_TOKENS
+
+
+def profile_cap(budget: int = PROMPT_TOKEN_BUDGET, max_tokens: int = PROMPT_PROFILE_TOKENS) -> int:
+    """Profile size that leaves PROMPT_TURN_RESERVE_TOKENS of the budget for the turn; the same on every turn."""
+    return max(0, min(max_tokens, budget - _SYSTEM_TOKENS - PROMPT_TURN_RESERVE_TOKENS))
+
+
+if PROMPT_TOKEN_BUDGET < _SYSTEM_TOKENS + PROMPT_TURN_RESERVE_TOKENS:
+    print(f"[prompt] PROMPT_TOKEN_BUDGET={PROMPT_TOKEN_BUDGET} leaves no room for the profile "
+          f"(system {_SYSTEM_TOKENS} + turn reserve {PROMPT_TURN_RESERVE_TOKENS} tokens)")
+
+
+def build_prompt(resume: str, projects: str, job_description: str,
+                 history: list[dict], transcript: str, max_turns: int = 5,
+                 budget: int = PROMPT_TOKEN_BUDGET, excerpts: str = "",
+                 profile_tokens: int = PROMPT_PROFILE_TOKENS) -> tuple[list[dict], dict]:
+    """
+    Token-budgeted prompt. Order is system, profile, history, turn so the
+    static prefix comes first. The profile is capped by profile_cap(), so it
+    stays the same across turns. When over budget, the oldest answers are
+    clipped first, then the oldest turns are dropped, and only then is the
+    profile cut further to fit. `excerpts` (retrieved for this question) go
+    into the turn message.
+    Returns (messages, info) with info = {"turns", "clipped", "tokens": per-section counts}.
+    """
+    cap = profile_cap(budget, profile_tokens)
+    profile, profile_tokens = profile_block(resume or "", projects or "", job_description or "", cap)
+    final = turn_message(transcript, excerpts)
+    final_tokens = count_tokens(final) + MESSAGE_OVERHEAD_TOKENS
+    room = budget - _SYSTEM_TOKENS - profile_tokens - final_tokens
+
+    turns, clipped = recent_turns(history, max_turns), 0
+    hist = history_messages(turns)
+    hist_tokens = _messages_tokens(hist)
+    while hist_tokens > room and clipped < len(turns):
+        clipped += 1
+        hist = history_messages(turns, clipped)
+        hist_tokens = _messages_tokens(hist)
+    while hist_tokens > room and turns:
+        turns, clipped = turns[1:], max(0, clipped - 1)
+        hist = history_messages(turns, clipped)
+        hist_tokens = _messages_tokens(hist)
+    if room < 0 and profile_tokens > MESSAGE_OVERHEAD_TOKENS:
+        # the turn message outgrew the reserve: only this prompt loses the cached prefix
+        cap = max(0, cap + room)
+        profile, profile_tokens = profile_block(resume or "", projects or "", job_description or "", cap)
+
+    messages = [{"role": "system", "content": SYSTEM_TEMPLATE},
+                {"role": "user", "content": profile},
+                *hist,
+                {"role": "user", "content": final}]
+    tokens = {"system": _SYSTEM_TOKENS, "profile": profile_tokens, "history": hist_tokens, "turn": final_tokens}
+    tokens["prompt"] = sum(tokens.values())
+    return messages, {"turns": turns, "clipped": clipped, "tokens": tokens}
+
+
+# new one 
+def build_messages_from_db(resume: str, projects: str, job_description: str,
+                           history: list[dict], transcript: str, max_turns: int = 5) -> list[dict]:
+    return build_prompt(resume, projects, job_description, history, transcript, max_turns)[0]
+
+
 def messages_snapshot(messages: list[dict]) -> str:
     """Optional: flatten the messages into a readable snapshot string for debugging."""
     lines = []
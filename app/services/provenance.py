@@ -0,0 +1,194 @@
+# app/services/provenance.py
+"""
+Compact prompt provenance for Transcript.meta.
+
+Instead of the full message list, each turn stores
+    {"prompt": {"v": 1, "system": <hash>, "profile": <hash>, "turn": <hash>,
+                "history": [<transcript id>, ...], "clipped": k, "clip": n,
+                "excerpts": <hash>}}
+where hashes point at content-addressed rows in prompt_parts. The system
+template and a user's profile snapshot are therefore stored once, however
+many turns use them; the first k history answers were cut to n tokens by the
+prompt budget, and "excerpts" (only for long profiles) are the retrieved
+chunks that went into the turn message. reconstruct_messages() rebuilds the exact message list.
+
+Migrate rows written with the old {"messages": [...]} format with:
+    python -m app.services.provenance migrate
+"""
+import hashlib
+import json
+import sys
+import uuid
+
+import sqlalchemy as sa
+
+from app.services import models
+from app.services.prompts import TURN_TEMPLATE, PROMPT_CLIP_TOKENS, history_messages, messages_snapshot, turn_message
+
+PROMPT_REF_VERSION = 1
+_KNOWN_MAX = 10000
+_known: set[str] = set()      # hashes this process has seen committed
+
+
+def part_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def prompt_ref(messages: list[dict], turns: list[dict], clipped: int = 0, excerpts: str = "") -> tuple[dict, dict]:
+    """
+    Reference for a prompt from build_prompt and the history turns and excerpts it used.
+    Returns (ref for Transcript.meta["prompt"], {hash: (kind, content)} parts to store).
+    """
+    contents = {"system": messages[0]["content"], "profile": messages[1]["content"], "turn": TURN_TEMPLATE}
+    if excerpts:
+        contents["excerpts"] = excerpts
+    hashes = {kind: part_hash(c) for kind, c in contents.items()}
+    ref = {"v": PROMPT_REF_VERSION, **hashes, "history": [t.get("id") for t in turns if t.get("id")]}
+    if clipped:
+        ref.update(clipped=clipped, clip=PROMPT_CLIP_TOKENS)
+    return ref, {hashes[kind]: (kind, c) for kind, c in contents.items()}
+
+
+def _insert_ignore(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"prompt_parts upsert not supported on {dialect_name}")
+    return insert(models.PromptPart)
+
+
+def _new_rows(parts: dict) -> list[dict]:
+    return [{"hash": h, "kind": kind, "content": c} for h, (kind, c) in parts.items() if h not in _known]
+
+
+def remember_parts(hashes: list[str]) -> None:
+    """Record parts as stored; call only once the transaction that inserted them has committed."""
+    if len(_known) > _KNOWN_MAX:
+        _known.clear()
+    _known.update(hashes)
+
+
+async def store_parts(db, parts: dict) -> list[str]:
+    """Insert missing parts in the caller's transaction (AsyncSession); returns their hashes for remember_parts."""
+    rows = _new_rows(parts)
+    if not rows:
+        return []
+    stmt = _insert_ignore(db.bind.dialect.name).values(rows).on_conflict_do_nothing(index_elements=["hash"])
+    await db.execute(stmt)
+    return [r["hash"] for r in rows]
+
+
+def store_parts_sync(db, parts: dict) -> list[str]:
+    rows = _new_rows(parts)
+    if not rows:
+        return []
+    stmt = _insert_ignore(db.get_bind().dialect.name).values(rows).on_conflict_do_nothing(index_elements=["hash"])
+    db.execute(stmt)
+    return [r["hash"] for r in rows]
+
+
+async def reconstruct_messages(db, row: models.Transcript) -> list[dict]:
+    """Rebuild the messages that were sent to the LLM for this turn."""
+    meta = row.meta or {}
+    if "messages" in meta:        # not migrated yet
+        return meta["messages"]
+    ref = meta.get("prompt")
+    if not ref:
+        return []
+
+    wanted = [ref["system"], ref["profile"], ref["turn"], *(h for _, h in ref.get("history_parts", []))]
+    for key in ("final", "excerpts"):
+        if key in ref:
+            wanted.append(ref[key])
+    parts = dict((await db.execute(
+        sa.select(models.PromptPart.hash, models.PromptPart.content).where(models.PromptPart.hash.in_(wanted))
+    )).all())
+    parts.setdefault(part_hash(TURN_TEMPLATE), TURN_TEMPLATE)
+
+    def part(h: str) -> str:
+        # a part can be missing if its row was lost; show that instead of failing the whole turn
+        return parts[h] if h in parts else f"[missing prompt part {h[:12]}]"
+
+    messages = [{"role": "system", "content": part(ref["system"])},
+                {"role": "user", "content": part(ref["profile"])}]
+    if ref.get("history"):
+        ids = [uuid.UUID(i) for i in ref["history"]]
+        turns = {str(t.id): t for t in await db.scalars(
+            sa.select(models.Transcript).where(models.Transcript.id.in_(ids)))}
+        messages.extend(history_messages(
+            [{"user": turns[i].text, "assistant": turns[i].assistant_text} for i in ref["history"] if i in turns],
+            ref.get("clipped", 0), ref.get("clip", PROMPT_CLIP_TOKENS),
+        ))
+    messages.extend({"role": role, "content": part(h)} for role, h in ref.get("history_parts", []))
+    if "final" in ref:
+        final = part(ref["final"])
+    elif ref["turn"] in parts:
+        excerpts = part(ref["excerpts"]) if "excerpts" in ref else ""
+        final = turn_message(row.text or "", excerpts, parts[ref["turn"]])
+    else:
+        final = part(ref["turn"])
+    messages.append({"role": "user", "content": final})
+    return messages
+
+
+async def prompt_snapshot(db, row: models.Transcript) -> str:
+    """Readable dump of a turn's prompt, see messages_snapshot."""
+    return messages_snapshot(await reconstruct_messages(db, row))
+
+
+def legacy_ref(messages: list[dict], transcript: str) -> tuple[dict, dict]:
+    """Convert an old inline message list into a ref; history is kept as parts since ids are unknown."""
+    system, profile, *rest = messages
+    final = rest.pop() if rest else {"content": ""}
+    contents = [("system", system["content"]), ("profile", profile["content"]), ("turn", TURN_TEMPLATE)]
+    ref = {"v": PROMPT_REF_VERSION, "system": part_hash(system["content"]),
+           "profile": part_hash(profile["content"]), "turn": part_hash(TURN_TEMPLATE),
+           "history": [], "history_parts": []}
+    for m in rest:
+        contents.append(("history", m["content"]))
+        ref["history_parts"].append([m["role"], part_hash(m["content"])])
+    if final["content"] != TURN_TEMPLATE.format(transcript=transcript or ""):
+        contents.append(("final", final["content"]))
+        ref["final"] = part_hash(final["content"])
+    return ref, {part_hash(c): (kind, c) for kind, c in contents}
+
+
+def migrate_legacy_meta(db, batch: int = 500) -> dict:
+    """Rewrite {"messages": [...]} metas in place (sync Session). Returns size stats."""
+    stats = {"rows": 0, "meta_bytes_before": 0, "meta_bytes_after": 0}
+    last_id = None
+    while True:
+        q = sa.select(models.Transcript).order_by(models.Transcript.id).limit(batch)
+        if last_id is not None:
+            q = q.where(models.Transcript.id > last_id)
+        rows = db.scalars(q).all()
+        if not rows:
+            break
+        stored = []
+        for row in rows:
+            meta = row.meta or {}
+            if "messages" not in meta:
+                continue
+            ref, parts = legacy_ref(meta["messages"], row.text)
+            stored += store_parts_sync(db, parts)
+            new_meta = {k: v for k, v in meta.items() if k != "messages"}
+            new_meta["prompt"] = ref
+            stats["rows"] += 1
+            stats["meta_bytes_before"] += len(json.dumps(meta))
+            stats["meta_bytes_after"] += len(json.dumps(new_meta))
+            row.meta = new_meta
+        db.commit()
+        remember_parts(stored)
+        last_id = rows[-1].id
+    return stats
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python -m app.services.provenance migrate")
+    from app.services.db import SessionLocal, engine, Base
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        print(json.dumps(migrate_legacy_meta(session)))
@@ -0,0 +1,170 @@
+# app/services/retrieval.py
+"""
+Local BM25 retrieval over a user's resume / projects / job description.
+
+Pure Python, CPU-only, no network: the index is built from the profile texts
+themselves. Sections are re-chunked only when their text changes, so saving a
+profile with an edited job description does not re-index the resume.
+
+For a long profile the profile message is cut down to a short, fixed head
+(RETRIEVAL_PROFILE_TOKENS) that is the same on every turn, which keeps the
+system+profile prefix cacheable; the chunks retrieved for a question go into
+that turn's final message and carry the detail.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from app.services.prompts import PROMPT_PROFILE_TOKENS, count_tokens
+
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") == "1"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+RETRIEVAL_CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "120"))
+RETRIEVAL_OVERLAP_WORDS = int(os.getenv("RETRIEVAL_OVERLAP_WORDS", "30"))
+# shorter profiles go into the profile message whole and need no excerpts
+RETRIEVAL_MIN_PROFILE_TOKENS = int(os.getenv("RETRIEVAL_MIN_PROFILE_TOKENS", "1500"))
+RETRIEVAL_PROFILE_TOKENS = int(os.getenv("RETRIEVAL_PROFILE_TOKENS", "600"))   # profile message size with excerpts
+RETRIEVAL_INDEX_CACHE = int(os.getenv("RETRIEVAL_INDEX_CACHE", "512"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SECTIONS = ("resume", "projects", "job_description")
+SECTION_TITLES = {"resume": "FROM MY RESUME", "projects": "FROM MY PROJECTS", "job_description": "FROM THE JOB_DESCRIPTION"}
+EXCERPT_SEPARATOR = "\n…\n"
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have how i in is it its me my of on "
+    "or our so that the their them then there these they this to was we were what when where which "
+    "who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t.rstrip(".-") for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def chunk_text(text: str, words: int = RETRIEVAL_CHUNK_WORDS, overlap: int = RETRIEVAL_OVERLAP_WORDS) -> list[str]:
+    """Overlapping windows of ~`words` words, never crossing a blank-line paragraph break."""
+    chunks = []
+    step = max(1, words - overlap)
+    for para in re.split(r"\n\s*\n", text or ""):
+        w = para.split()
+        if not w:
+            continue
+        for start in range(0, max(1, len(w) - overlap), step):
+            chunks.append(" ".join(w[start:start + words]))
+    return chunks
+
+
+class _Section:
+    __slots__ = ("digest", "chunks", "tfs", "lengths")
+
+    def __init__(self, text: str):
+        self.digest = hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+        self.chunks = chunk_text(text)
+        toks = [tokenize(c) for c in self.chunks]
+        self.tfs = [Counter(t) for t in toks]
+        self.lengths = [len(t) for t in toks]
+
+
+class ProfileIndex:
+    """BM25 over the chunks of all three profile sections."""
+
+    def __init__(self):
+        self.sections: dict[str, _Section] = {}
+        self.df: Counter = Counter()
+        self.n = 0
+        self.avgdl = 0.0
+        self.profile_tokens = 0
+
+    def update(self, texts: dict[str, str]) -> bool:
+        """Re-chunk only the sections whose text changed; returns whether anything did."""
+        changed = False
+        for name in SECTIONS:
+            text = texts.get(name) or ""
+            sec = self.sections.get(name)
+            if sec is None or sec.digest != hashlib.sha1(text.encode("utf-8")).hexdigest():
+                self.sections[name] = _Section(text)
+                changed = True
+        if changed:
+            self.df = Counter()
+            lengths = []
+            for sec in self.sections.values():
+                for tf in sec.tfs:
+                    self.df.update(tf.keys())
+                lengths.extend(sec.lengths)
+            self.n = len(lengths)
+            self.avgdl = (sum(lengths) / self.n) if self.n else 0.0
+            self.profile_tokens = sum(count_tokens(texts.get(name) or "") for name in SECTIONS)
+        return changed
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> list[tuple[str, int]]:
+        """Top-k (section, chunk index) pairs for the query."""
+        terms = set(tokenize(query))
+        if not terms or not self.n:
+            return []
+        idf = {t: math.log(1 + (self.n - self.df[t] + 0.5) / (self.df[t] + 0.5)) for t in terms if self.df[t]}
+        scored = []
+        for name, sec in self.sections.items():
+            for i, (tf, dl) in enumerate(zip(sec.tfs, sec.lengths)):
+                score = 0.0
+                for t, w in idf.items():
+                    f = tf.get(t)
+                    if f:
+                        score += w * f * (BM25_K1 + 1) / (f + BM25_K1 * (1 - BM25_B + BM25_B * dl / (self.avgdl or 1)))
+                if score > 0:
+                    scored.append((score, name, i))
+        scored.sort(reverse=True)
+        return [(name, i) for _, name, i in scored[:k]]
+
+    def excerpts(self, query: str, k: int = RETRIEVAL_TOP_K) -> dict[str, str]:
+        """Top-k chunks per section, kept in document order so the prompt reads naturally."""
+        picked: dict[str, list[int]] = {name: [] for name in SECTIONS}
+        for name, i in self.search(query, k):
+            picked[name].append(i)
+        return {name: EXCERPT_SEPARATOR.join(self.sections[name].chunks[i] for i in sorted(idx))
+                for name, idx in picked.items() if name in self.sections}
+
+
+class IndexStore:
+    """Per-user ProfileIndex objects, LRU-bounded and updated in place."""
+
+    def __init__(self, maxsize: int = RETRIEVAL_INDEX_CACHE):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, ProfileIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, resume: str, projects: str, job_description: str) -> ProfileIndex:
+        key = str(user_id)
+        with self._lock:
+            index = self._data.get(key)
+            if index is None:
+                index = self._data[key] = ProfileIndex()
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+            self._data.move_to_end(key)
+            index.update({"resume": resume, "projects": projects, "job_description": job_description})
+        return index
+
+
+profile_indexes = IndexStore()
+
+
+def relevant_excerpts(user_id, resume: str, projects: str, job_description: str, query: str) -> tuple[str, int]:
+    """
+    (excerpts, profile_tokens): the top-k profile chunks for the question as
+    one block ("" when the profile is short or nothing matches) and the size
+    to cap the profile message at. The cap depends only on the profile.
+    """
+    if not RETRIEVAL_ENABLED or not user_id:
+        return "", PROMPT_PROFILE_TOKENS
+    index = profile_indexes.get(user_id, resume, projects, job_description)
+    if index.profile_tokens < RETRIEVAL_MIN_PROFILE_TOKENS:
+        return "", PROMPT_PROFILE_TOKENS
+    ex = index.excerpts(query)
+    return ("\n\n".join(f"{SECTION_TITLES[name]}\n{ex[name]}" for name in SECTIONS if ex.get(name)),
+            min(RETRIEVAL_PROFILE_TOKENS, PROMPT_PROFILE_TOKENS))
@@ -0,0 +1,60 @@
+# app/services/segment_buffer.py
+"""
+Fixed-capacity PCM buffer for one speech segment.
+
+Frames are copied once, from the WebSocket message into a bytearray sized
+for SEGMENT_MAX_SEC of audio, with 44 bytes of room in front so a WAV of the
+segment can be produced by writing the header in place. Readers get
+memoryview slices, which the FLAC/Opus encoders read directly; a WAV upload
+of a trimmed chunk copies the slice once to prepend its header.
+When the buffer is full the caller ends the segment early, which bounds
+memory per connection on long monologues.
+"""
+import os
+
+from app.services.audio_codec import wav_header
+
+SEGMENT_MAX_SEC = float(os.getenv("SEGMENT_MAX_SEC", "30"))
+WAV_HEADER_BYTES = 44
+
+
+class SegmentBuffer:
+    def __init__(self, *, rate: int, frame_bytes: int, max_sec: float = SEGMENT_MAX_SEC):
+        self.rate = rate
+        self.frame_bytes = frame_bytes
+        self.max_frames = max(1, int(max_sec * rate * 2) // frame_bytes)
+        self._buf = bytearray(WAV_HEADER_BYTES + self.max_frames * frame_bytes)
+        self._view = memoryview(self._buf)     # writes through a view can never resize the buffer
+        self._frames = 0
+
+    def __len__(self) -> int:
+        """Frames in the segment."""
+        return self._frames
+
+    @property
+    def full(self) -> bool:
+        return self._frames >= self.max_frames
+
+    def extend(self, frames) -> int:
+        """Copy frames in until the buffer is full; returns how many were taken."""
+        taken = 0
+        for frame in frames:
+            if self.full:
+                break
+            off = WAV_HEADER_BYTES + self._frames * self.frame_bytes
+            self._view[off:off + self.frame_bytes] = frame
+            self._frames += 1
+            taken += 1
+        return taken
+
+    def pcm(self, start: int = 0, end: int | None = None) -> memoryview:
+        """PCM of frames [start, end) without copying."""
+        end = self._frames if end is None else min(end, self._frames)
+        fb = self.frame_bytes
+        return self._view[WAV_HEADER_BYTES + start * fb:WAV_HEADER_BYTES + end * fb]
+
+    def wav(self) -> memoryview:
+        """The whole segment as a WAV file, header written in place."""
+        n = self._frames * self.frame_bytes
+        self._view[:WAV_HEADER_BYTES] = wav_header(n, self.rate)
+        return self._view[:WAV_HEADER_BYTES + n]
@@ -0,0 +1,113 @@
+# app/services/speculative.py
+import asyncio
+import os
+import re
+import time
+
+from app.services import metrics
+from app.services.llm import stream_llm_response
+
+SPECULATE_AFTER_MS = float(os.getenv("SPECULATE_AFTER_MS", "400"))   # 0 disables speculation
+
+STATS = {
+    "started": 0,            # speculative answers launched on a probable end of turn
+    "used": 0,               # ... adopted once the turn was confirmed
+    "cancelled": 0,          # ... dropped before that (the speaker resumed)
+    "wasted_llm_calls": 0,   # cancelled after the LLM request had been sent
+    "wasted_tokens": 0,      # tokens generated by those calls
+}
+
+
+class AnswerTask:
+    """
+    Produces one turn's answer in the background and buffers its tokens.
+
+    prepare() returns a dict with at least "messages", or None when the turn
+    should be dropped; the LLM stream is then started from those messages, or
+    the "cached" answer is replayed if one was found. The caller
+    waits on ready() and relays stream(); until then nothing reaches the client,
+    so a speculative answer can be cancelled without any visible effect.
+    """
+
+    def __init__(self, prepare, *, speculative: bool = False, trace: metrics.TurnTrace | None = None):
+        self.speculative = speculative
+        self.confirmed = not speculative
+        self.trace = trace
+        self.prepared = None
+        self.tokens: list[str] = []
+        self.llm_started = False
+        self.llm_seconds = 0.0
+        self._ready = asyncio.Event()
+        self._new = asyncio.Event()
+        self._on_prepared: list = []
+        with metrics.tracing(trace):
+            self.task = asyncio.create_task(self._run(prepare))
+        if speculative:
+            STATS["started"] += 1
+
+    async def _run(self, prepare):
+        try:
+            self.prepared = await prepare()
+        finally:
+            self._ready.set()
+        if self.prepared is None:
+            return
+        for fn in self._on_prepared:
+            fn()
+        if self.prepared.get("cached"):
+            self.tokens.extend(re.findall(r"\S+\s*|\s+", self.prepared["cached"]))
+            self._new.set()
+            return
+        self.llm_started = True
+        t0 = time.monotonic()
+        async for tok in stream_llm_response(self.prepared["messages"]):
+            self.tokens.append(tok)
+            self._new.set()
+        self.llm_seconds = time.monotonic() - t0
+
+    async def ready(self):
+        """Wait for transcription/guard/prompt; re-raises their errors."""
+        await self._ready.wait()
+        if self.task.done() and not self.task.cancelled() and self.task.exception():
+            raise self.task.exception()
+        return self.prepared
+
+    def confirm(self) -> None:
+        """The turn really ended: this speculation is the answer, and cancelling it later is not waste."""
+        if not self.confirmed:
+            self.confirmed = True
+            STATS["used"] += 1
+
+    async def stream(self):
+        """Yield buffered tokens, then live ones until the LLM stream ends."""
+        self.confirm()
+        i = 0
+        while True:
+            while i < len(self.tokens):
+                yield self.tokens[i]
+                i += 1
+            if self.task.done():
+                self.task.result()
+                return
+            self._new.clear()
+            waiter = asyncio.create_task(self._new.wait())
+            await asyncio.wait({waiter, self.task}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+
+    def when_prepared(self, fn) -> None:
+        """Call fn() once prepare() has produced a turn to answer (right away if it already has)."""
+        if not self._ready.is_set():
+            self._on_prepared.append(fn)
+        elif self.prepared is not None:
+            fn()
+
+    def failed(self) -> bool:
+        return self.task.done() and (self.task.cancelled() or self.task.exception() is not None)
+
+    def cancel(self) -> None:
+        if not self.confirmed:
+            STATS["cancelled"] += 1
+            if self.llm_started:
+                STATS["wasted_llm_calls"] += 1
+                STATS["wasted_tokens"] += len(self.tokens)
+        self.task.cancel()
@@ -1,17 +1,64 @@
-import openai
-import os
 import io
+import time
 
-def transcribe_audio(wav_bytes: bytes) -> str:
+from app.services import metrics
+from app.services.audio_codec import encode
+from app.services.clients import get_openai_client
+
+
+def _seg(seg, name):
+    return seg.get(name) if isinstance(seg, dict) else getattr(seg, name, None)
+
+
+def transcribe_audio_detailed(audio_bytes: bytes, filename: str = "audio.wav",
+                              mime: str = "audio/wav") -> tuple[str, dict]:
     """
-    Transcribe audio file to text using OpenAI Whisper
-    Returns transcribed text
+    Transcribe audio with OpenAI Whisper and keep its confidence signals.
+    Returns (text, meta) where meta has duration-weighted no_speech_prob and
+    avg_logprob and the max compression_ratio over segments (empty if unknown).
     """
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    with io.BytesIO(wav_bytes) as f:
+    client = get_openai_client()
+    with io.BytesIO(audio_bytes) as f:
         transcript = client.audio.transcriptions.create(
             model="whisper-1",
-            file=("audio.wav", f, "audio/wav"),
-            language="en"
+            file=(filename, f, mime),
+            language="en",
+            response_format="verbose_json"
         )
-    return transcript.text
+    segments = getattr(transcript, "segments", None) or []
+    meta = {}
+    try:
+        weights = [max(1e-3, (_seg(s, "end") or 0) - (_seg(s, "start") or 0)) for s in segments]
+        total = sum(weights)
+        if segments and total:
+            meta = {
+                "no_speech_prob": sum(_seg(s, "no_speech_prob") * w for s, w in zip(segments, weights)) / total,
+                "avg_logprob": sum(_seg(s, "avg_logprob") * w for s, w in zip(segments, weights)) / total,
+                "compression_ratio": max(_seg(s, "compression_ratio") for s in segments),
+            }
+    except TypeError:
+        meta = {}
+    return transcript.text, meta
+
+
+def transcribe_audio(wav_bytes: bytes) -> str:
+    """
+    Transcribe audio file to text using OpenAI Whisper
+    Returns transcribed text
+    """
+    return transcribe_audio_detailed(wav_bytes)[0]
+
+
+def transcribe_pcm(pcm) -> tuple[str, dict]:
+    """Encode raw 16 kHz s16le PCM in the configured upload format and transcribe it (blocking)."""
+    t0 = time.monotonic()
+    filename, data, mime = encode(pcm)
+    t1 = time.monotonic()
+    metrics.observe_stage("encode", t1 - t0)
+    metrics.mark("audio_encoded", t1)
+    metrics.mark("asr_request", t1)
+    result = transcribe_audio_detailed(data, filename, mime)
+    t2 = time.monotonic()
+    metrics.observe_stage("asr", t2 - t1)
+    metrics.mark("asr_response", t2)
+    return result
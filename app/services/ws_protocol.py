@@ -0,0 +1,81 @@
+# app/services/ws_protocol.py
+"""
+Wire format of /ws-audio binary messages, negotiated in the JSON hello.
+
+v1: every message is one raw 30 ms frame (960 bytes of 16 kHz s16le).
+v2: every message is a packet of several frames behind a 10-byte header
+
+    uint32 seq | uint32 timestamp_ms | uint16 frame_count   (little-endian)
+
+followed by frame_count * frame_bytes of PCM. Packets are split with
+memoryview slices, so frames are never copied out of the message.
+
+The client offers {"protocols": [2, 1]} in its hello; the server answers
+{"type": "ready", "protocol": n, "frames_per_packet": k, "answers": ...}.
+Clients that send no "protocols" get v1. A hello with "answers": "ws" asks
+for answer events on this same socket (app.services.answer_sink) instead of
+Socket.IO; "answers" in the reply says which one the server picked.
+"""
+import os
+import struct
+
+PROTOCOLS = (2, 1)
+HEADER = struct.Struct("<IIH")
+WS_FRAMES_PER_PACKET = int(os.getenv("WS_FRAMES_PER_PACKET", "5"))     # suggested to v2 clients
+WS_MAX_FRAMES_PER_PACKET = int(os.getenv("WS_MAX_FRAMES_PER_PACKET", "34"))
+WS_ANSWERS_ENABLED = os.getenv("WS_ANSWERS_ENABLED", "1") == "1"
+
+STATS = {"connections": {1: 0, 2: 0}, "messages": 0, "frames": 0, "malformed": 0, "lost_packets": 0}
+
+
+def negotiate(hello: dict) -> dict:
+    offered = hello.get("protocols") or [1]
+    try:
+        version = max(v for v in offered if v in PROTOCOLS)
+    except (TypeError, ValueError):
+        version = 1
+    STATS["connections"][version] += 1
+    answers = "ws" if WS_ANSWERS_ENABLED and hello.get("answers") == "ws" else "socketio"
+    return {"type": "ready", "protocol": version, "frames_per_packet": WS_FRAMES_PER_PACKET if version > 1 else 1,
+            "answers": answers}
+
+
+def pack(seq: int, timestamp_ms: int, frames: bytes, frame_bytes: int) -> bytes:
+    """Build a v2 packet (used by clients and load tests)."""
+    return HEADER.pack(seq & 0xFFFFFFFF, timestamp_ms & 0xFFFFFFFF, len(frames) // frame_bytes) + frames
+
+
+class FrameDecoder:
+    """Turns binary WebSocket messages into fixed-size frames for the negotiated protocol."""
+
+    def __init__(self, version: int, frame_bytes: int):
+        self.version = version
+        self.frame_bytes = frame_bytes
+        self.next_seq: int | None = None
+        self.timestamp_ms = 0
+
+    def feed(self, data: bytes) -> list[memoryview]:
+        STATS["messages"] += 1
+        if self.version == 1:
+            if len(data) != self.frame_bytes:
+                STATS["malformed"] += 1
+                return []
+            STATS["frames"] += 1
+            return [memoryview(data)]
+
+        if len(data) < HEADER.size:
+            STATS["malformed"] += 1
+            return []
+        seq, self.timestamp_ms, count = HEADER.unpack_from(data)
+        fb = self.frame_bytes
+        if not 0 < count <= WS_MAX_FRAMES_PER_PACKET or len(data) != HEADER.size + count * fb:
+            STATS["malformed"] += 1
+            return []
+        if self.next_seq is not None and seq != self.next_seq:
+            gap = (seq - self.next_seq) & 0xFFFFFFFF
+            if gap < 0x80000000:
+                STATS["lost_packets"] += gap
+        self.next_seq = (seq + 1) & 0xFFFFFFFF
+        STATS["frames"] += count
+        view = memoryview(data)
+        return [view[o:o + fb] for o in range(HEADER.size, len(data), fb)]
@@ -6,6 +6,28 @@ class PCMCollector extends AudioWorkletProcessor {
         this.frameSamples = Math.round(targetSampleRate * frameMs / 1000); // 480
         this.buf = new Float32Array(0);
         this.frac = 0; this.prev = 0; // resampler state
+        // wire format, set from the server's "ready" message (see app/services/ws_protocol.py)
+        this.protocol = 0; this.framesPerPacket = 1; this.seq = 0; this.pending = [];
+        this.port.onmessage = (evt) => {
+            if (evt.data?.type !== 'config') return;
+            this.protocol = evt.data.protocol;
+            this.framesPerPacket = Math.max(1, evt.data.framesPerPacket | 0);
+        };
+    }
+    send(i16) {
+        if (!this.protocol) return; // not negotiated yet
+        if (this.protocol === 1) { this.port.postMessage({ type: 'packet', bytes: new Uint8Array(i16.buffer) }); return; }
+        this.pending.push(i16);
+        if (this.pending.length < this.framesPerPacket) return;
+        // v2: uint32 seq | uint32 timestamp_ms | uint16 frame_count, then the frames
+        const HEADER = 10, fb = this.frameSamples * 2;
+        const out = new Uint8Array(HEADER + this.pending.length * fb), dv = new DataView(out.buffer);
+        dv.setUint32(0, this.seq++ >>> 0, true);
+        dv.setUint32(4, Math.round(currentTime * 1000) >>> 0, true);
+        dv.setUint16(8, this.pending.length, true);
+        this.pending.forEach((f, k) => out.set(new Uint8Array(f.buffer), HEADER + k * fb));
+        this.pending = [];
+        this.port.postMessage({ type: 'packet', bytes: out }, [out.buffer]);
     }
     resample(mono) {
         const inHz = sampleRate;
@@ -33,7 +55,7 @@ class PCMCollector extends AudioWorkletProcessor {
                 let s = Math.max(-1, Math.min(1, frame[i]));
                 i16[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
             }
-            this.port.postMessage({ type: 'frame', bytes: new Uint8Array(i16.buffer) });
+            this.send(i16);
             const rem = this.buf.length - this.frameSamples;
             const tmp = new Float32Array(rem);
             tmp.set(this.buf.subarray(this.frameSamples));
@@ -0,0 +1,81 @@
+"""
+Answer delivery over Socket.IO (one message per token) vs back over the
+/ws-audio socket with token coalescing (app.services.answer_sink).
+
+Runs the app under uvicorn against the stub OpenAI server. --users clients
+each stream one spoken question and wait for the answer. For each transport
+the bench reports answer messages received, messages/sec, server CPU and
+time from the last audio packet to the completed answer.
+
+    python -m bench.answer_transport --users 40 --answer-tokens 300 --tokens-per-sec 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from bench.clients import SioClient, app_server, cpu_seconds, create_user, free_port, stream_audio
+from bench.stub_openai import start as start_stub
+from bench.upload_formats import load_pcm
+
+
+async def one_user(mode: str, ws_base: str, token: str, session_id: str, pcm: bytes) -> dict:
+    if mode == "ws":
+        events: list = []
+        sent = await stream_audio(ws_base, token, session_id, pcm, realtime=False, linger=60, events=events)
+    else:
+        client = SioClient()
+        await client.connect(ws_base, token, session_id)
+        sent = await stream_audio(ws_base, token, session_id, pcm, realtime=False)
+        await client.wait_for("complete", timeout=60)
+        await client.close()
+        events = client.events
+    text = "".join(e[2]["token"] for e in events if e[1] == "token")
+    done = [e[0] for e in events if e[1] == "complete"]
+    return {"messages": len(events), "chars": len(text), "latency": done[0] - sent if done else None}
+
+
+async def run(mode: str, ws_base: str, users: list, pcm: bytes, pid: int) -> dict:
+    cpu0, t0 = cpu_seconds(pid), time.monotonic()
+    results = await asyncio.gather(*[one_user(mode, ws_base, tok, sid, pcm) for tok, sid in users])
+    wall, cpu = time.monotonic() - t0, cpu_seconds(pid) - cpu0
+    latencies = [r["latency"] for r in results if r["latency"] is not None]
+    messages = sum(r["messages"] for r in results)
+    return {
+        "transport": mode,
+        "completed": len(latencies),
+        "answer_messages": messages,
+        "messages_per_answer": round(messages / max(1, len(results)), 1),
+        "messages_per_sec": round(messages / wall, 1),
+        "chars_received": sum(r["chars"] for r in results),
+        "server_cpu_sec": round(cpu, 2),
+        "answer_done_p50_ms": round(1000 * statistics.median(latencies), 1) if latencies else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=40)
+    ap.add_argument("--answer-tokens", type=int, default=300)
+    ap.add_argument("--tokens-per-sec", type=float, default=200.0)
+    args = ap.parse_args()
+
+    stub, openai_url = start_stub(ttft_ms=100, tokens_per_sec=args.tokens_per_sec, answer_tokens=args.answer_tokens)
+    port = free_port()
+    env = {"OPENAI_BASE_URL": openai_url, "OPENAI_API_KEY": "bench", "ANSWER_CACHE_ENABLED": "0",
+           "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/transport.db"}
+    pcm = load_pcm(None, 3.0) + b"\0" * 960 * 100
+    with app_server(port, env) as proc:
+        base = f"http://127.0.0.1:{port}"
+        users = [create_user(base) for _ in range(args.users)]
+        results = [asyncio.run(run(mode, f"ws://127.0.0.1:{port}", users, pcm, proc.pid))
+                   for mode in ("socketio", "ws")]
+    stub.shutdown()
+    print(json.dumps({"users": args.users, "answer_tokens": args.answer_tokens,
+                      "tokens_per_sec": args.tokens_per_sec, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Authenticated request throughput, with and without the auth cache
+(app.services.auth_cache), alone and during a login burst.
+
+For each --modes entry a fresh uvicorn server (own SQLite database) is
+started with AUTH_CACHE_TTL_SEC=0 ("cache_off") or the default TTL
+("cache_on"), and --users users are registered. Then, for --seconds each:
+
+- authed: --concurrency clients loop over GET /me, /profile and
+  /history/sessions with their bearer tokens;
+- authed_during_logins: the same, while --login-burst clients log in back to
+  back, so bcrypt competes with the authenticated requests.
+
+Reports requests/sec and latency percentiles per phase, logins/sec and how
+many logins were turned away with 503 (PASSWORD_HASH_QUEUE full).
+
+    python -m bench.auth_throughput --concurrency 50 --login-burst 40 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from bench.clients import app_server, free_port
+from bench.loadtest import dist
+
+PATHS = ("/me", "/profile", "/history/sessions")
+PASSWORD = "bench-pass"
+
+
+def register_users(base: str, n: int) -> list[tuple[str, str]]:
+    """(email, token) for n fresh users."""
+    users = []
+    with httpx.Client(base_url=base, timeout=60) as http:
+        for _ in range(n):
+            email = f"{uuid.uuid4().hex[:12]}@example.com"
+            http.post("/auth/register", json={"email": email, "password": PASSWORD}).raise_for_status()
+            r = http.post("/auth/login", json={"email": email, "password": PASSWORD})
+            r.raise_for_status()
+            users.append((email, r.json()["access_token"]))
+    return users
+
+
+async def phase(base: str, users: list, concurrency: int, logins: int, seconds: float) -> dict:
+    latencies: list[float] = []
+    login_ms: list[float] = []
+    counts = {"errors": 0, "login_busy": 0, "login_errors": 0}
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=concurrency + logins, max_keepalive_connections=concurrency + logins)
+
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as http:
+        async def authed(i: int):
+            headers = {"Authorization": f"Bearer {users[i % len(users)][1]}"}
+            n = i
+            while time.monotonic() < deadline:
+                t = time.perf_counter()
+                r = await http.get(PATHS[n % len(PATHS)], headers=headers)
+                n += 1
+                if r.status_code == 200:
+                    latencies.append(1000 * (time.perf_counter() - t))
+                else:
+                    counts["errors"] += 1
+
+        async def login(i: int):
+            email = users[i % len(users)][0]
+            while time.monotonic() < deadline:
+                t = time.perf_counter()
+                r = await http.post("/auth/login", json={"email": email, "password": PASSWORD})
+                if r.status_code == 200:
+                    login_ms.append(1000 * (time.perf_counter() - t))
+                elif r.status_code == 503:
+                    counts["login_busy"] += 1
+                    await asyncio.sleep(float(r.headers.get("retry-after", "1")))
+                else:
+                    counts["login_errors"] += 1
+
+        t0 = time.monotonic()
+        await asyncio.gather(*[authed(i) for i in range(concurrency)], *[login(i) for i in range(logins)])
+        wall = time.monotonic() - t0
+
+    out = {"requests": len(latencies), "requests_per_sec": round(len(latencies) / wall, 1),
+           "latency_ms": dist(latencies), "errors": counts["errors"]}
+    if logins:
+        out.update(logins_per_sec=round(len(login_ms) / wall, 1), login_ms=dist(login_ms),
+                   login_busy=counts["login_busy"], login_errors=counts["login_errors"])
+    return out
+
+
+def run_mode(mode: str, args) -> dict:
+    env = {"DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/auth.db", "OPENAI_API_KEY": "bench",
+           "BCRYPT_ROUNDS": str(args.bcrypt_rounds)}
+    if mode == "cache_off":
+        env["AUTH_CACHE_TTL_SEC"] = "0"
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    with app_server(port, env):
+        users = register_users(base, args.users)
+        return {
+            "mode": mode,
+            "authed": asyncio.run(phase(base, users, args.concurrency, 0, args.seconds)),
+            "authed_during_logins": asyncio.run(phase(base, users, args.concurrency, args.login_burst, args.seconds)),
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modes", default="cache_off,cache_on")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--login-burst", type=int, default=40)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--bcrypt-rounds", type=int, default=12)
+    args = ap.parse_args()
+    results = [run_mode(mode, args) for mode in args.modes.split(",")]
+    print(json.dumps({"concurrency": args.concurrency, "login_burst": args.login_burst, "seconds": args.seconds,
+                      "bcrypt_rounds": args.bcrypt_rounds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
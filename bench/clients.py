@@ -0,0 +1,193 @@
+"""
+Helpers shared by the benchmarks that drive a running app: spawning uvicorn
+workers, creating a user, a minimal Socket.IO (Engine.IO 4, websocket
+transport) client, a /ws-audio streamer and a synthetic voice to stream.
+"""
+import array
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+import websockets
+
+from app.services.ws_protocol import pack
+
+RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = 960
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def scratch_dirs() -> dict:
+    """SEGMENTS_DIR/RECORDINGS_DIR in a temp directory, so bench audio never lands in the repo."""
+    tmp = tempfile.mkdtemp()
+    return {"SEGMENTS_DIR": f"{tmp}/segments", "RECORDINGS_DIR": f"{tmp}/recordings"}
+
+
+def cpu_seconds(pid: int) -> float:
+    """User+system CPU time of a process, from /proc (Linux)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def speech_pcm(seconds: float) -> bytes:
+    """Voice-like 16 kHz s16le: a gliding harmonic tone in syllable-rate bursts, with a little noise."""
+    rng = random.Random(0)
+    out = array.array("h")
+    phase = 0.0
+    for n in range(int(seconds * RATE)):
+        t = n / RATE
+        phase += 2 * math.pi * (120 + 30 * math.sin(2 * math.pi * 0.3 * t)) / RATE
+        voiced = sum(math.sin(phase * k) / k for k in range(1, 12))
+        envelope = max(0.0, math.sin(2 * math.pi * 2.5 * t))
+        x = voiced * envelope * 0.25 + rng.gauss(0, 0.02)
+        out.append(int(max(-1.0, min(1.0, x)) * 32767))
+    if sys.byteorder != "little":
+        out.byteswap()
+    return out.tobytes()
+
+
+@contextlib.contextmanager
+def app_server(port: int, env: dict, workers: int = 1):
+    """uvicorn app.main:app in a child process; yields the Popen once it accepts connections."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **scratch_dirs(), **env}, stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/login", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"server on port {port} did not start")
+            time.sleep(0.2)
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def create_user(base: str) -> tuple[str, str]:
+    """Register a throwaway user; returns (token, session_id)."""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    httpx.post(f"{base}/auth/register", json={"email": email, "password": "bench-pass"}).raise_for_status()
+    r = httpx.post(f"{base}/auth/login", json={"email": email, "password": "bench-pass"})
+    r.raise_for_status()
+    token = r.json()["access_token"]
+    r = httpx.post(f"{base}/start-chat", headers={"Authorization": f"Bearer {token}"})
+    r.raise_for_status()
+    return token, r.json()["session_id"]
+
+
+class SioClient:
+    """Just enough Socket.IO to authenticate, join a session room and record events."""
+
+    def __init__(self):
+        self.events: list[tuple[float, str, object]] = []
+        self.event_bytes = 0        # size of the event frames received
+        self.changed = asyncio.Event()
+        self._ws = None
+        self._task = None
+
+    async def connect(self, ws_base: str, token: str, session_id: str) -> None:
+        self._ws = await websockets.connect(f"{ws_base}/socket.io/?EIO=4&transport=websocket")
+        opened = await self._ws.recv()
+        assert opened.startswith("0"), opened
+        await self._ws.send("40" + json.dumps({"token": token}))
+        while not (await self._ws.recv()).startswith("40"):
+            pass
+        await self._ws.send("42" + json.dumps(["join", {"session_id": session_id}]))
+        self._task = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        with contextlib.suppress(websockets.ConnectionClosed):
+            async for msg in self._ws:
+                if msg == "2":
+                    await self._ws.send("3")
+                elif msg.startswith("42"):
+                    self.event_bytes += len(msg.encode())
+                    name, *data = json.loads(msg[2:])
+                    self.events.append((time.monotonic(), name, data[0] if data else None))
+                    self.changed.set()
+
+    async def wait_for(self, name: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not any(e[1] == name for e in self.events):
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), deadline - time.monotonic())
+            except (asyncio.TimeoutError, ValueError):
+                return False
+        return True
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def stream_audio(ws_base: str, token: str, session_id: str, pcm: bytes, *,
+                       protocol: int = 2, frames_per_packet: int = 5, realtime: bool = True,
+                       linger: float = 0.0, events: list | None = None) -> float:
+    """
+    Send pcm over /ws-audio; returns the monotonic time the last packet was sent.
+    With `events`, answers are requested on this socket and (time, type, data)
+    tuples are appended to it; the call then waits up to `linger` for "complete".
+    """
+    async with websockets.connect(f"{ws_base}/ws-audio?token={token}", max_size=None) as ws:
+        hello = {"type": "hello", "session_id": session_id, "sample_rate": RATE,
+                 "frame_ms": FRAME_MS, "protocols": [protocol]}
+        if events is not None:
+            hello["answers"] = "ws"
+        await ws.send(json.dumps(hello))
+        ready = json.loads(await ws.recv())
+        done = asyncio.Event()
+
+        async def read():
+            with contextlib.suppress(websockets.ConnectionClosed):
+                async for msg in ws:
+                    data = json.loads(msg)
+                    events.append((time.monotonic(), data["type"], data))
+                    if data["type"] == "complete":
+                        done.set()
+
+        reader = asyncio.create_task(read()) if events is not None and ready.get("answers") == "ws" else None
+        n = ready.get("frames_per_packet", frames_per_packet) if ready["protocol"] == 2 else 1
+        step = n * FRAME_BYTES
+        start = time.monotonic()
+        for seq, off in enumerate(range(0, len(pcm) - step + 1, step)):
+            chunk = pcm[off:off + step]
+            await ws.send(pack(seq, int((time.monotonic() - start) * 1000), chunk, FRAME_BYTES)
+                          if ready["protocol"] == 2 else chunk)
+            if realtime:
+                await asyncio.sleep(max(0.0, start + (seq + 1) * n * FRAME_MS / 1000 - time.monotonic()))
+        sent = time.monotonic()
+        if reader is not None:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(done.wait(), linger)
+            reader.cancel()
+        elif linger:
+            await asyncio.sleep(linger)
+        return sent
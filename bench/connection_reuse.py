@@ -0,0 +1,90 @@
+"""
+Connection reuse of the pooled OpenAI clients (app.services.clients).
+
+Starts the stub OpenAI server in this process and counts the TCP
+connections it accepts. Runs --calls sequential transcriptions through
+transcribe_audio (the sync client, the same thread each time) and --calls
+sequential chat streams through stream_llm_response (the async client).
+For reference it also runs the transcriptions with a new client per call,
+which opens one connection each.
+
+Exits 1 when a pooled phase opened more than OPENAI_MAX_KEEPALIVE
+connections.
+
+    python -m bench.connection_reuse --calls 50
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import wave
+
+from bench.stub_openai import start as start_stub
+
+STUB, STUB_URL = start_stub(asr_latency_ms=5, ttft_ms=5, tokens_per_sec=0, answer_tokens=5)
+# set before the app is imported: its modules read their settings at import time
+os.environ.update({"OPENAI_BASE_URL": STUB_URL, "OPENAI_API_KEY": "bench"})
+
+import openai
+
+from app.services import clients
+from app.services.llm import stream_llm_response
+from app.services.transcribe import transcribe_audio
+
+
+def silence_wav(seconds: float) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(b"\0" * int(seconds * 16000) * 2)
+    return buf.getvalue()
+
+
+def counted(fn) -> dict:
+    calls = STUB.RequestHandlerClass.calls
+    before = dict(calls)
+    fn()
+    return {k: calls[k] - before[k] for k in ("connections", "transcriptions", "chat")}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=50)
+    args = ap.parse_args()
+    audio = silence_wav(1.0)
+
+    def asr_pooled():
+        for _ in range(args.calls):
+            transcribe_audio(audio)
+
+    def llm_pooled():
+        async def go():
+            for _ in range(args.calls):
+                async for _tok in stream_llm_response([{"role": "user", "content": "hi"}]):
+                    pass
+            await clients.close_clients()
+        asyncio.run(go())
+
+    def asr_fresh_client():
+        for _ in range(args.calls):
+            with openai.OpenAI(base_url=STUB_URL, api_key="bench") as client:
+                client.audio.transcriptions.create(model="whisper-1", file=("a.wav", audio),
+                                                   response_format="verbose_json")
+
+    results = {"transcribe_pooled": counted(asr_pooled), "llm_stream_pooled": counted(llm_pooled),
+               "transcribe_new_client_per_call": counted(asr_fresh_client)}
+    STUB.shutdown()
+    limit = clients.OPENAI_MAX_KEEPALIVE
+    failed = [name for name in ("transcribe_pooled", "llm_stream_pooled") if results[name]["connections"] > limit]
+    print(json.dumps({"calls": args.calls, "max_keepalive": limit, "results": results,
+                      "ok": not failed}, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
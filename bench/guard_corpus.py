@@ -0,0 +1,99 @@
+"""
+Transcript guard benchmark: LLM calls avoided and per-call cost.
+
+Runs a labelled corpus of Whisper outputs (real interviewer speech vs.
+fillers/hallucinations seen on silence, clicks and background audio) through
+the old exact-match FILLER_PHRASES check and through app.services.guard.
+
+    python -m bench.guard_corpus [--repeat 2000]
+"""
+import argparse
+import json
+import sys
+import time
+
+from app.services import guard
+
+# (transcript, whisper meta, is_real_question)
+CORPUS = [
+    ("Can you walk me through how you designed the retrieval pipeline?", {}, True),
+    ("Tell me about yourself.", {}, True),
+    ("Why do you want to work here?", {}, True),
+    ("How exactly did you pick the chunk size and overlap?", {}, True),
+    ("Thank you. So what was the hardest bug you shipped to production?", {}, True),
+    ("Okay, and how did you measure latency in that system?", {}, True),
+    ("What trade-offs did you make between cost and accuracy?", {}, True),
+    ("So tell me about a time you disagreed with your manager.", {}, True),
+    ("Which libraries did you use for the embedding service?", {"no_speech_prob": 0.05, "avg_logprob": -0.2, "compression_ratio": 1.3}, True),
+    ("Describe the data model behind your feature store.", {"no_speech_prob": 0.1, "avg_logprob": -0.4, "compression_ratio": 1.2}, True),
+    ("Thanks for watching!", {}, False),
+    ("Thank you for watching.", {}, False),
+    (" Thanks for watching ", {}, False),
+    ("THANKS FOR WATCHING", {}, False),
+    ("Thanks for watching, and don't forget to subscribe!", {}, False),
+    ("Please like, share and subscribe.", {}, False),
+    ("Um, uh, hmm.", {}, False),
+    ("Okay. Okay. Yeah.", {}, False),
+    ("I'll see you in the next video. Bye!", {}, False),
+    ("Thank you very much. Bye.", {}, False),
+    ("Subtitles by the Amara.org community", {}, False),
+    ("hmm...", {}, False),
+    ("you you you you you you you you you you", {"no_speech_prob": 0.3, "avg_logprob": -0.6, "compression_ratio": 3.1}, False),
+    ("The the the the.", {"no_speech_prob": 0.82, "avg_logprob": -1.4, "compression_ratio": 1.5}, False),
+    ("Click.", {"no_speech_prob": 0.9, "avg_logprob": -1.2, "compression_ratio": 1.0}, False),
+    ("I'm going to go ahead and start.", {"no_speech_prob": 0.75, "avg_logprob": -1.3, "compression_ratio": 1.1}, False),
+]
+
+LEGACY_FILLER_PHRASES = {
+    "um", "uh", "hmm", "mm", "er", "ah", "eh", "huh", "hmmm", "hmm..", "hmm...", "hmmm...", "hmm.",
+    "thanks for watching", " Thanks for Watching ", "Thank you for watching.", "Thank you for watching!",
+    "Thanks for watching!", "Thank you. Good.", "Thanks for watching. Bye.", "I'll see you in the next video.",
+    "Thank you very much.", "please like", "please like share", "please like share subscribe",
+    "like share subscribe", "subscribe to my channel", "see you in the next video", "see you next time",
+    "check out my other videos", "don't forget to like", "don't forget to subscribe", "hit the bell icon",
+    "smash that like button", "follow for more", "follow me for more", "share and subscribe", "and subscribe",
+    "watch my other videos", "watch next video", "watch next",
+}
+
+
+def legacy_check(text, meta=None):
+    clean = (text or "").strip()
+    tokens = [t for t in clean.replace(",", " ").split() if t]
+    if not clean or len(tokens) < 2 or len(clean) < 12 or clean in LEGACY_FILLER_PHRASES:
+        return "dropped"
+    return None
+
+
+def evaluate(check, repeat: int) -> dict:
+    passed = [(text, real) for text, meta, real in CORPUS if check(text, meta) is None]
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text, meta, _ in CORPUS:
+            check(text, meta)
+    per_call_us = (time.perf_counter() - t0) / (repeat * len(CORPUS)) * 1e6
+    return {
+        "llm_calls": len(passed),
+        "wasted_llm_calls": sum(1 for _, real in passed if not real),
+        "real_questions_dropped": sum(1 for _, _, real in CORPUS if real) - sum(1 for _, real in passed if real),
+        "per_call_us": round(per_call_us, 2),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args(argv)
+    out = {
+        "corpus": len(CORPUS),
+        "hallucinations": sum(1 for *_, real in CORPUS if not real),
+        "legacy": evaluate(legacy_check, args.repeat),
+        "guard": evaluate(guard.check, args.repeat),
+    }
+    out["llm_calls_avoided"] = out["legacy"]["llm_calls"] - out["guard"]["llm_calls"]
+    json.dump(out, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+"""
+History endpoint latency as one user's transcript table grows.
+
+Seeds a throwaway SQLite database in steps up to --turns rows (a tenth of
+them in one long session, the rest in --session-turns sized sessions),
+rebuilds session_summaries with backfill_summaries at each checkpoint, then
+times through the app (in-process, httpx ASGI transport):
+
+  sessions        first page of /history/sessions
+  transcripts     first page of the long session via /history/transcripts
+  transcripts_deep  the long session's page after following a cursor to its end
+  chat_history    first page of /get_chat_history for the long session
+
+next to the queries these endpoints used to run (the GROUP BY over every
+transcript, the unbounded session read; timed as bare queries, without the
+HTTP and auth overhead the endpoint numbers include). Median of --repeat
+calls, in ms.
+
+    python -m bench.history_scale --turns 100000 --checkpoints 1000,10000,100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bench.clients import scratch_dirs
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/history.db"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.update(scratch_dirs())
+
+import httpx
+import sqlalchemy as sa
+
+from app.main import fastapi
+from app.services import models
+from app.services.auth import create_access_token
+from app.services.db import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.services.history import backfill_summaries
+
+LONG_SESSION = "long-session"
+T = models.Transcript
+
+
+def seed(user_id, start: int, stop: int, session_turns: int, t0: datetime) -> None:
+    rows = []
+    for i in range(start, stop):
+        sid = LONG_SESSION if i % 10 == 0 else f"s{(i - i // 10 - 1) // session_turns}"
+        rows.append({"id": uuid.uuid4(), "user_id": user_id, "session_id": sid,
+                     "text": f"question {i} " * 4, "assistant_text": f"answer {i} " * 20,
+                     "tokens": 120, "meta": {}, "created_at": t0 + timedelta(milliseconds=i)})
+    with engine.begin() as conn:
+        for off in range(0, len(rows), 5000):
+            conn.execute(sa.insert(T), rows[off:off + 5000])
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        await fn()
+        samples.append(1000 * (time.perf_counter() - t))
+    return round(statistics.median(samples), 2)
+
+
+async def measure(client: httpx.AsyncClient, user_id, repeat: int) -> dict:
+    async def get(url, **kw):
+        r = await client.get(url, **kw)
+        r.raise_for_status()
+        return r
+
+    cursor, deep = None, None
+    while True:                     # walk to the last page once to get a deep cursor
+        data = (await get("/history/transcripts", params={"session_id": LONG_SESSION, "limit": 500,
+                                                          **({"cursor": cursor} if cursor else {})})).json()
+        if not data["next_cursor"]:
+            break
+        deep, cursor = cursor, data["next_cursor"]
+    deep = cursor or deep
+
+    async def legacy_sessions():
+        async with AsyncSessionLocal() as db:
+            (await db.execute(
+                sa.select(T.session_id, sa.func.max(T.created_at))
+                .where(T.user_id == user_id, T.session_id.isnot(None), T.session_id != "")
+                .group_by(T.session_id).order_by(sa.desc(sa.func.max(T.created_at)))
+            )).all()
+
+    async def legacy_transcripts():
+        async with AsyncSessionLocal() as db:
+            (await db.scalars(sa.select(T).where(T.user_id == user_id, T.session_id == LONG_SESSION)
+                              .order_by(T.created_at.asc(), T.id.asc()))).all()
+
+    return {
+        "sessions": await timed(lambda: get("/history/sessions"), repeat),
+        "transcripts": await timed(lambda: get("/history/transcripts", params={"session_id": LONG_SESSION}), repeat),
+        "transcripts_deep": await timed(lambda: get("/history/transcripts", params={
+            "session_id": LONG_SESSION, **({"cursor": deep} if deep else {})}), repeat),
+        "chat_history": await timed(lambda: get("/get_chat_history", headers={"X-Session-Id": LONG_SESSION}), repeat),
+        "legacy_sessions_groupby": await timed(legacy_sessions, repeat),
+        "legacy_transcripts_all": await timed(legacy_transcripts, repeat),
+    }
+
+
+async def run(args) -> list:
+    with SessionLocal() as db:
+        user = models.User(email=f"{uuid.uuid4().hex[:12]}@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    headers = {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+    t0 = datetime.now(timezone.utc) - timedelta(days=30)
+    checkpoints = sorted(int(c) for c in args.checkpoints.split(",") if int(c) <= args.turns)
+    results, seeded = [], 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fastapi),
+                                 base_url="http://bench", headers=headers) as client:
+        for target in checkpoints:
+            seed(user_id, seeded, target, args.session_turns, t0)
+            seeded = target
+            with SessionLocal() as db:
+                summary = backfill_summaries(db)
+            row = {"turns": seeded, "session_rows": summary["sessions"]}
+            row.update(await measure(client, user_id, args.repeat))
+            results.append(row)
+            print(json.dumps(row), file=sys.stderr)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=100_000)
+    ap.add_argument("--checkpoints", default="1000,10000,100000")
+    ap.add_argument("--session-turns", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=15)
+    args = ap.parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps({"session_turns": args.session_turns, "ms_median": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Offline load test: the app in-process against a stub OpenAI server, driven
+by simulated audio clients.
+
+The ASGI app (app.main:app) runs under uvicorn inside this process, against
+a throwaway SQLite database, with OPENAI_BASE_URL pointing at
+bench.stub_openai. The stub runs in a child process with configurable ASR
+latency, time to first token and token rate. --clients simulated users run
+in --client-procs child processes so their CPU is not charged to the app.
+
+Each simulated user:
+- joins its session room over Socket.IO (or asks for answers on /ws-audio
+  with --answers ws);
+- streams 16 kHz PCM over /ws-audio at real-time pace: speech (--audio WAV
+  or a synthetic voice) and then silence until the answer completes;
+- does this --turns times.
+
+The report is JSON. It includes:
+- time to first token from the last speech frame, and time to the complete
+  answer (client clock);
+- turns/sec and timeouts;
+- event-loop lag of the server's loop (a sleep probe);
+- server CPU and RSS, in total and per connection;
+- mean stage times from app.services.metrics and a few service counters.
+
+--check compares the report against a previous one and exits 1 when a
+watched number got worse by more than --tolerance.
+
+    python -m bench.loadtest --clients 200 --turns 3 --out run.json
+    python -m bench.loadtest --clients 200 --turns 3 --check run.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+FRAME_MS = 30
+FRAME_BYTES = 960
+PAGE = os.sysconf("SC_PAGE_SIZE")
+
+# report paths watched by --check (higher is worse)
+WATCHED = ("ttft_ms.p95", "answer_ms.p95", "loop_lag_ms.p99", "server.cpu_ms_per_conn_sec", "server.rss_kb_per_conn")
+
+
+def pct(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+def dist(values: list[float]) -> dict:
+    return {"n": len(values), "p50": pct(values, 0.5), "p95": pct(values, 0.95), "p99": pct(values, 0.99),
+            "max": round(max(values), 1) if values else None}
+
+
+# ---------------------- simulated clients (child process) ----------------------
+class Pacer:
+    """Sends packets on the real-time schedule of the audio they carry."""
+
+    def __init__(self, ws, protocol: int, frames_per_packet: int):
+        from app.services.ws_protocol import pack
+        self.ws = ws
+        self.pack = pack if protocol == 2 else None
+        self.n = frames_per_packet if protocol == 2 else 1
+        self.start = time.monotonic()
+        self.seq = 0
+        self.late_ms = 0.0
+
+    async def send(self, pcm: bytes) -> None:
+        step = self.n * FRAME_BYTES
+        for off in range(0, len(pcm) - step + 1, step):
+            chunk = pcm[off:off + step]
+            ts = int((time.monotonic() - self.start) * 1000)
+            await self.ws.send(self.pack(self.seq, ts, chunk, FRAME_BYTES) if self.pack else chunk)
+            self.seq += 1
+            delay = self.start + self.seq * self.n * FRAME_MS / 1000 - time.monotonic()
+            self.late_ms = max(self.late_ms, -1000 * delay)
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def run_client(cfg: dict, token: str, session_id: str, speech: bytes, delay: float) -> dict:
+    import websockets
+    from bench.clients import SioClient
+
+    await asyncio.sleep(delay)
+    out = {"turns": [], "timeouts": 0, "errors": 0, "send_late_ms": 0.0}
+    sio = None
+    events: list = []
+    try:
+        if cfg["answers"] == "socketio":
+            sio = SioClient()
+            await sio.connect(cfg["ws_base"], token, session_id)
+            events = sio.events
+        async with websockets.connect(f"{cfg['ws_base']}/ws-audio?token={token}", max_size=None) as ws:
+            await ws.send(json.dumps({"type": "hello", "session_id": session_id, "sample_rate": 16000,
+                                      "frame_ms": FRAME_MS, "protocols": [cfg["protocol"]],
+                                      "answers": cfg["answers"]}))
+            ready = json.loads(await ws.recv())
+            reader = None
+            if ready.get("answers") == "ws":
+                async def read():
+                    with contextlib.suppress(websockets.ConnectionClosed):
+                        async for msg in ws:
+                            data = json.loads(msg)
+                            events.append((time.monotonic(), data["type"], data))
+                reader = asyncio.create_task(read())
+            pacer = Pacer(ws, ready["protocol"], ready.get("frames_per_packet", cfg["frames_per_packet"]))
+            silence = b"\0" * (FRAME_BYTES * pacer.n)
+            for _ in range(cfg["turns"]):
+                seen = len(events)
+                await pacer.send(speech)
+                speech_end = time.monotonic()
+                first = done = None
+                while time.monotonic() - speech_end < cfg["turn_timeout"]:
+                    await pacer.send(silence)
+                    for t, name, _data in events[seen:]:
+                        if name == "token" and first is None:
+                            first = t
+                        elif name == "complete":
+                            done = t
+                    if done is not None:
+                        break
+                if done is None:
+                    out["timeouts"] += 1
+                else:
+                    out["turns"].append({"ttft_ms": round(1000 * ((first or done) - speech_end), 1),
+                                         "answer_ms": round(1000 * (done - speech_end), 1)})
+                pause_end = time.monotonic() + cfg["pause_sec"]
+                while time.monotonic() < pause_end:
+                    await pacer.send(silence)
+            out["send_late_ms"] = round(pacer.late_ms, 1)
+            if reader is not None:
+                reader.cancel()
+    except Exception as e:
+        out["errors"] += 1
+        out["error"] = repr(e)
+    finally:
+        if sio is not None:
+            await sio.close()
+    return out
+
+
+async def client_worker() -> None:
+    """Reads {config, users} as JSON on stdin and prints one JSON line per finished client."""
+    from bench.upload_formats import load_pcm
+
+    job = json.load(sys.stdin)
+    cfg = job["config"]
+    speech = load_pcm(cfg["audio"], cfg["speech_sec"])
+    speech = speech[:len(speech) - len(speech) % FRAME_BYTES]
+
+    async def one(i, token, session_id):
+        result = await run_client(cfg, token, session_id, speech, i * cfg["ramp_sec"] / max(1, cfg["clients"]))
+        print(json.dumps(result), flush=True)
+
+    await asyncio.gather(*[one(i, tok, sid) for i, tok, sid in job["users"]])
+
+
+# ---------------------- app side (this process) ----------------------
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE
+
+
+def cpu_seconds() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+async def probe_lag(samples: list, interval: float = 0.05) -> None:
+    while True:
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(1000 * max(0.0, time.perf_counter() - t - interval))
+
+
+async def sample_rss(peak: list) -> None:
+    while True:
+        peak[0] = max(peak[0], rss_bytes())
+        await asyncio.sleep(0.25)
+
+
+def create_users(n: int) -> list[tuple[str, str]]:
+    """Users straight in the DB (no bcrypt in the measured process); returns (token, session_id)."""
+    from app.services import models
+    from app.services.auth import create_access_token
+    from app.services.db import SessionLocal
+
+    with SessionLocal() as db:
+        users = [models.User(email=f"{uuid.uuid4().hex[:12]}@example.com", password_hash="x") for _ in range(n)]
+        db.add_all(users)
+        db.commit()
+        return [(create_access_token(str(u.id)), uuid.uuid4().hex) for u in users]
+
+
+async def run(args) -> dict:
+    import uvicorn
+
+    from app.main import app
+    from app.services import metrics, persistence, pipeline, speculative, ws_protocol
+    from bench.clients import free_port
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           ws_max_size=1 << 20))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+
+    users = create_users(args.clients)
+    cfg = {k: getattr(args, k) for k in ("clients", "turns", "protocol", "frames_per_packet", "answers",
+                                         "audio", "speech_sec", "pause_sec", "ramp_sec", "turn_timeout")}
+    cfg["ws_base"] = f"ws://127.0.0.1:{port}"
+
+    lag: list[float] = []
+    rss0 = rss_bytes()
+    peak = [rss0]
+    probes = [asyncio.create_task(probe_lag(lag)), asyncio.create_task(sample_rss(peak))]
+    cpu0, t0 = cpu_seconds(), time.monotonic()
+
+    procs = []
+    for p in range(args.client_procs):
+        chunk = [(i, tok, sid) for i, (tok, sid) in enumerate(users) if i % args.client_procs == p]
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "bench.loadtest", "--client-worker",
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        proc.stdin.write(json.dumps({"config": cfg, "users": chunk}).encode())
+        proc.stdin.close()
+        procs.append(proc)
+    results = []
+    for proc in procs:
+        async for line in proc.stdout:
+            results.append(json.loads(line))
+        await proc.wait()
+
+    wall, cpu = time.monotonic() - t0, cpu_seconds() - cpu0
+    for task in probes:
+        task.cancel()
+    server.should_exit = True
+    await serving
+
+    ttft = [t["ttft_ms"] for r in results for t in r["turns"]]
+    answer = [t["answer_ms"] for r in results for t in r["turns"]]
+    stages = metrics.stage_seconds.summary()
+    return {
+        "config": {k: v for k, v in cfg.items() if k != "ws_base"} | {
+            "asr_latency_ms": args.asr_latency_ms, "ttft_ms": args.ttft_ms,
+            "tokens_per_sec": args.tokens_per_sec, "answer_tokens": args.answer_tokens,
+            "client_procs": args.client_procs, "env": args.env},
+        "turns_completed": len(ttft),
+        "turns_timed_out": sum(r["timeouts"] for r in results),
+        "client_errors": sum(r["errors"] for r in results),
+        "turns_per_sec": round(len(ttft) / wall, 2),
+        "wall_sec": round(wall, 1),
+        "ttft_ms": dist(ttft),
+        "answer_ms": dist(answer),
+        "loop_lag_ms": dist(lag),
+        "client_send_late_ms_max": max((r["send_late_ms"] for r in results), default=0.0),
+        "server": {
+            "cpu_sec": round(cpu, 2),
+            "cpu_pct": round(100 * cpu / wall, 1),
+            "cpu_ms_per_conn_sec": round(1000 * cpu / wall / max(1, args.clients), 3),
+            "rss_mb_start": round(rss0 / 2**20, 1),
+            "rss_mb_peak": round(peak[0] / 2**20, 1),
+            "rss_kb_per_conn": round((peak[0] - rss0) / 1024 / max(1, args.clients), 1),
+        },
+        "stage_mean_ms": {k: round(1000 * v["sum"] / v["count"], 1) for k, v in sorted(stages.items()) if v["count"]},
+        "counters": {
+            "turn_outcomes": dict(metrics.STATS["outcomes"]),
+            "pipeline_dropped": pipeline.STATS["dropped"],
+            "pipeline_cancelled": pipeline.STATS["cancelled"],
+            "speculative_used": speculative.STATS["used"],
+            "speculative_cancelled": speculative.STATS["cancelled"],
+            "lost_packets": ws_protocol.STATS["lost_packets"],
+            "persist_max_queue_depth": persistence.STATS["max_queue_depth"],
+            "persist_max_flush_ms": round(persistence.STATS["max_flush_ms"], 1),
+        },
+    }
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def lookup(report: dict, path: str):
+    for key in path.split("."):
+        report = (report or {}).get(key)
+    return report
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    out = []
+    for path in WATCHED:
+        new, old = lookup(report, path), lookup(baseline, path)
+        if new is not None and old and new > old * (1 + tolerance):
+            out.append(f"{path}: {old} -> {new}")
+    return out
+
+
+def main():
+    if sys.argv[1:] == ["--client-worker"]:
+        asyncio.run(client_worker())
+        return
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--client-procs", type=int, default=0, help="default: one per 150 clients")
+    ap.add_argument("--turns", type=int, default=2)
+    ap.add_argument("--audio", help="16 kHz mono s16le WAV to speak each turn (default: synthetic voice)")
+    ap.add_argument("--speech-sec", type=float, default=3.0, help="length of the synthetic utterance")
+    ap.add_argument("--pause-sec", type=float, default=1.0, help="silence after each answer")
+    ap.add_argument("--ramp-sec", type=float, default=5.0, help="spread client start times over this long")
+    ap.add_argument("--turn-timeout", type=float, default=30.0)
+    ap.add_argument("--protocol", type=int, choices=(1, 2), default=2)
+    ap.add_argument("--frames-per-packet", type=int, default=5)
+    ap.add_argument("--answers", choices=("socketio", "ws"), default="socketio")
+    ap.add_argument("--asr-latency-ms", type=float, default=300.0)
+    ap.add_argument("--ttft-ms", type=float, default=400.0)
+    ap.add_argument("--tokens-per-sec", type=float, default=60.0)
+    ap.add_argument("--answer-tokens", type=int, default=80)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app settings")
+    ap.add_argument("--out", help="also write the report here")
+    ap.add_argument("--check", metavar="BASELINE", help="exit 1 if watched numbers regressed vs this report")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+    args.client_procs = args.client_procs or max(1, -(-args.clients // 150))
+
+    from bench.clients import free_port, scratch_dirs
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, "-m", "bench.stub_openai", "--port", str(stub_port),
+                             "--asr-latency-ms", str(args.asr_latency_ms), "--ttft-ms", str(args.ttft_ms),
+                             "--tokens-per-sec", str(args.tokens_per_sec),
+                             "--answer-tokens", str(args.answer_tokens)], stdout=subprocess.DEVNULL)
+    # set before the app is imported: its modules read their settings at import time
+    os.environ.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1", "OPENAI_API_KEY": "loadtest",
+        "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/loadtest.db", "ANSWER_CACHE_ENABLED": "0",
+        **scratch_dirs(),
+    })
+    os.environ.update(kv.split("=", 1) for kv in args.env)
+    try:
+        wait_for_port(stub_port)
+        with contextlib.redirect_stdout(sys.stderr):     # the app logs with print(); stdout is the report
+            report = asyncio.run(run(args))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.check:
+        with open(args.check) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print("[loadtest] regression:", line, file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
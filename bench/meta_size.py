@@ -0,0 +1,92 @@
+"""
+Transcript.meta size and /history/transcripts latency: inline prompt vs prompt refs.
+
+Seeds two throwaway SQLite databases with the same N turns, one storing
+meta={"messages": [...]} (old format) and one storing meta={"prompt": ref}
+(app.services.provenance), then reports file size and the time to load and
+serialise one session the way /history/transcripts does.
+
+    python -m bench.meta_size --turns 2000 --profile-chars 12000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+# the app's engine is created at import; the bench seeds its own databases and never uses it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/meta_size_unused.db")
+
+from app.services import models
+from app.services.db import Base
+from app.services.prompts import build_prompt
+from app.services.provenance import prompt_ref, store_parts_sync
+
+
+def seed(path: str, turns: int, profile_chars: int, compact: bool) -> sa.Engine:
+    engine = sa.create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    third = "x" * (profile_chars // 3)
+    with Session(engine) as db:
+        user = models.User(email=f"{uuid.uuid4().hex}@bench.local", password_hash="-")
+        db.add(user)
+        db.flush()
+        history = []
+        for i in range(turns):
+            question = f"question {i}: how exactly did you tune the retriever?"
+            answer = "I " + "tuned it carefully " * 40
+            messages, info = build_prompt(third, third, third, history, question, 5)
+            if compact:
+                ref, parts = prompt_ref(messages, info["turns"], info["clipped"])
+                store_parts_sync(db, parts)
+                meta = {"prompt": ref}
+            else:
+                meta = {"messages": messages}
+            row = models.Transcript(user_id=user.id, session_id="bench", text=question,
+                                    assistant_text=answer, meta=meta)
+            db.add(row)
+            db.flush()
+            history.insert(0, {"id": str(row.id), "user": question, "assistant": answer})
+            history = history[:5]
+        db.commit()
+    return engine
+
+
+def history_latency_ms(engine: sa.Engine, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with Session(engine) as db:
+            rows = db.scalars(sa.select(models.Transcript).where(models.Transcript.session_id == "bench")
+                              .order_by(models.Transcript.created_at.asc())).all()
+            json.dumps([{"id": str(r.id), "text": r.text, "assistant_text": r.assistant_text,
+                         "meta": r.meta or {}} for r in rows])
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=1000)
+    ap.add_argument("--profile-chars", type=int, default=9000)
+    args = ap.parse_args(argv)
+
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, compact in (("inline_messages", False), ("prompt_refs", True)):
+            path = os.path.join(tmp, f"{name}.db")
+            engine = seed(path, args.turns, args.profile_chars, compact)
+            out[name] = {"db_bytes": os.path.getsize(path), "history_ms": round(history_latency_ms(engine), 2)}
+            engine.dispose()
+    json.dump({"turns": args.turns, "profile_chars": args.profile_chars, **out}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
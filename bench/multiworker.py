@@ -0,0 +1,82 @@
+"""
+Routing check for multi-worker mode (SOCKETIO_MESSAGE_QUEUE).
+
+Starts an in-process fakeredis TCP server, a stub OpenAI server and --workers
+separate uvicorn processes on their own ports. For every pair of workers
+(a, b) a user's Socket.IO client connects to worker a while the same
+session's audio streams into worker b; a bystander session is joined on a
+third worker. Passes when every listener gets its own answer and the
+bystander gets nothing. Needs fakeredis (requirements-dev.txt).
+
+    python -m bench.multiworker --workers 3
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import tempfile
+import threading
+
+from fakeredis import TcpFakeServer
+
+from bench.clients import SioClient, app_server, create_user, free_port, stream_audio
+from bench.stub_openai import start as start_stub
+from bench.upload_formats import load_pcm
+
+
+async def check_pair(bases: list[str], a: int, b: int, pcm: bytes) -> dict:
+    http = bases[a].replace("ws://", "http://")
+    token, session_id = create_user(http)
+    other_token, other_session = create_user(http)
+    listener, bystander = SioClient(), SioClient()
+    await listener.connect(bases[a], token, session_id)
+    await bystander.connect(bases[(b + 1) % len(bases)], other_token, other_session)
+    await stream_audio(bases[b], token, session_id, pcm + b"\0" * 960 * 100, realtime=False, linger=0.5)
+    ok = await listener.wait_for("complete", timeout=15)
+    await asyncio.sleep(0.5)
+    await listener.close()
+    await bystander.close()
+    return {
+        "socketio_worker": a, "audio_worker": b, "delivered": ok,
+        "tokens": sum(1 for e in listener.events if e[1] == "token"),
+        "leaked_to_bystander": len(bystander.events),
+    }
+
+
+async def run(bases: list[str]) -> list[dict]:
+    pcm = load_pcm(None, 3.0)
+    n = len(bases)
+    return [await check_pair(bases, a, b, pcm) for a in range(n) for b in range(n) if a != b]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=3)
+    args = ap.parse_args()
+
+    redis_port = free_port()
+    redis_server = TcpFakeServer(("127.0.0.1", redis_port), server_type="redis")
+    threading.Thread(target=redis_server.serve_forever, daemon=True).start()
+    stub, openai_url = start_stub(ttft_ms=50, tokens_per_sec=200, answer_tokens=10)
+    env = {
+        "SOCKETIO_MESSAGE_QUEUE": f"redis://127.0.0.1:{redis_port}/0",
+        "OPENAI_BASE_URL": openai_url,
+        "OPENAI_API_KEY": "bench",
+        "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/multiworker.db",
+        "ANSWER_CACHE_ENABLED": "0",
+    }
+    ports = [free_port() for _ in range(args.workers)]
+    with contextlib.ExitStack() as stack:
+        for port in ports:
+            stack.enter_context(app_server(port, env))
+        results = asyncio.run(run([f"ws://127.0.0.1:{p}" for p in ports]))
+    stub.shutdown()
+    redis_server.shutdown()
+    passed = all(r["delivered"] and r["tokens"] and not r["leaked_to_bystander"] for r in results)
+    print(json.dumps({"workers": args.workers, "passed": passed, "pairs": results}, indent=2))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
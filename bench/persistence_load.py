@@ -0,0 +1,104 @@
+"""
+Turn persistence on the answer path: one transaction per turn vs the
+write-behind TurnWriter (app.services.persistence).
+
+--connections simulated connections each save --turns turns back to back
+into DATABASE_URL (a throwaway SQLite database if unset). Reports how long
+the save call holds up the answer (p50/p99), total time until every turn is
+committed, the number of transactions and, for write-behind, the batch flush
+latency from persistence.STATS.
+
+    python -m bench.persistence_load --connections 200 --turns 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from bench.clients import scratch_dirs
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/persist.db")
+os.environ.update(scratch_dirs())
+
+from app.services import models, persistence
+from app.services.db import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.services.persistence import STATS, TurnWriter, write_turns
+
+
+def make_turn(user_id, session_id: str, i: int) -> dict:
+    return {"id": uuid.uuid4(), "user_id": user_id, "session_id": session_id,
+            "text": f"question {i}", "assistant_text": "answer " * 60, "tokens": 200,
+            "meta": {"prompt": {"v": 1}}, "created_at": datetime.now(timezone.utc), "parts": None}
+
+
+async def inline(turn: dict) -> None:
+    async with AsyncSessionLocal() as db:
+        await write_turns(db, [turn])
+
+
+async def run(mode: str, users: list, turns: int) -> dict:
+    writer = TurnWriter() if mode == "write_behind" else None
+    if writer is not None:
+        writer.start()
+    batches0 = STATS["batches"]
+    waits: list[float] = []
+
+    async def connection(user_id):
+        session_id = uuid.uuid4().hex
+        for i in range(turns):
+            turn = make_turn(user_id, session_id, i)
+            t = time.perf_counter()
+            await (writer.submit(turn) if writer is not None else inline(turn))
+            waits.append(1000 * (time.perf_counter() - t))
+            await asyncio.sleep(0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[connection(u) for u in users])
+    if writer is not None:
+        await writer.close()
+    total = time.perf_counter() - t0
+    waits.sort()
+    out = {
+        "mode": mode,
+        "turns": len(waits),
+        "save_wait_p50_ms": round(statistics.median(waits), 3),
+        "save_wait_p99_ms": round(waits[int(0.99 * (len(waits) - 1))], 3),
+        "all_committed_sec": round(total, 2),
+        "turns_per_sec": round(len(waits) / total, 1),
+        "transactions": len(waits) if writer is None else STATS["batches"] - batches0,
+    }
+    if writer is not None:
+        out.update(max_flush_ms=round(STATS["max_flush_ms"], 1), max_queue_depth=STATS["max_queue_depth"])
+    return out
+
+
+async def main_async(args) -> list:
+    results = [await run(mode, args.users, args.turns) for mode in ("inline", "write_behind")]
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--connections", type=int, default=200)
+    ap.add_argument("--turns", type=int, default=10)
+    args = ap.parse_args()
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        args.users = [models.User(email=f"{uuid.uuid4().hex[:12]}@example.com", password_hash="x")
+                      for _ in range(args.connections)]
+        db.add_all(args.users)
+        db.commit()
+        args.users = [u.id for u in args.users]
+    results = asyncio.run(main_async(args))
+    print(json.dumps({"connections": args.connections, "turns_per_connection": args.turns,
+                      "flush_ms": persistence.PERSIST_FLUSH_MS, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
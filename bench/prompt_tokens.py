@@ -0,0 +1,77 @@
+"""
+Prompt tokens per turn with and without profile retrieval (app.services.retrieval).
+
+Builds a synthetic profile of --profile-words words per section and a
+handful of interview questions, then builds each turn's prompt the way
+prepare_turn does: once with retrieval off (the whole profile, capped at
+PROMPT_PROFILE_TOKENS) and once with it on (a fixed RETRIEVAL_PROFILE_TOKENS
+head plus the top-k excerpts in the turn message). Reports mean tokens per
+section and whether the system+profile prefix is identical across questions.
+
+    python -m bench.prompt_tokens --profile-words 300,1500,3000
+"""
+import argparse
+import json
+import random
+import statistics
+
+from app.services import retrieval
+from app.services.prompts import build_prompt
+
+TOPICS = {
+    "kafka": "kafka consumer lag partitions exactly-once offsets schema registry",
+    "spark": "spark jobs shuffle partitions skew broadcast joins parquet delta",
+    "kubernetes": "kubernetes helm autoscaling pods ingress rollout canary probes",
+    "postgres": "postgres indexes vacuum replication partitioning query plans pgbouncer",
+    "ml": "pytorch transformers fine-tuning embeddings retrieval evaluation recall",
+    "team": "mentored engineers hiring roadmap stakeholders incident reviews on-call",
+}
+QUESTIONS = [
+    "How did you deal with consumer lag on the Kafka pipeline?",
+    "Walk me through how you tuned the Spark shuffle partitions.",
+    "How did you roll out changes safely on Kubernetes?",
+    "What did you do about slow Postgres queries?",
+    "How did you evaluate the retrieval model you fine-tuned?",
+    "Tell me about mentoring engineers on your team.",
+]
+FILLER = "worked delivered improved designed owned shipped measured reduced system service platform customers".split()
+
+
+def section(words: int, rng: random.Random) -> str:
+    paras, n = [], 0
+    while n < words:
+        topic = rng.choice(list(TOPICS.values())).split()
+        para = " ".join(rng.choice(topic if rng.random() < 0.4 else FILLER) for _ in range(80))
+        paras.append(para)
+        n += 80
+    return "\n\n".join(paras)
+
+
+def run(words: int, enabled: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    resume, projects, jd = section(words, rng), section(words, rng), section(words // 2, rng)
+    retrieval.RETRIEVAL_ENABLED = enabled
+    tokens, prefixes = [], set()
+    for i, q in enumerate(QUESTIONS):
+        excerpts, profile_tokens = retrieval.relevant_excerpts(f"bench-{words}", resume, projects, jd, q)
+        messages, info = build_prompt(resume, projects, jd, [], q, excerpts=excerpts, profile_tokens=profile_tokens)
+        tokens.append(info["tokens"])
+        prefixes.add((messages[0]["content"], messages[1]["content"]))
+    return {k: round(statistics.mean(t[k] for t in tokens)) for k in tokens[0]} | {"stable_prefix": len(prefixes) == 1}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--profile-words", default="300,1500,3000")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    results = []
+    for words in map(int, args.profile_words.split(",")):
+        results.append({"profile_words_per_section": words,
+                        "retrieval_off": run(words, False, args.seed),
+                        "retrieval_on": run(words, True, args.seed)})
+    print(json.dumps({"questions": len(QUESTIONS), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
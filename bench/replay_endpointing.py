@@ -0,0 +1,91 @@
+"""
+Replay recorded speech through the end-of-turn detector.
+
+Each WAV (16 kHz mono s16le) is treated as ONE interviewer turn. It is fed
+frame by frame into app.services.endpointing.Endpointer, followed by enough
+silence to let the turn close. For every file we report how many times the
+detector ended the turn early (false splits) and how long after the last
+voiced frame the real end of turn was declared (end-of-turn latency).
+
+    python -m bench.replay_endpointing recordings/*.wav --min-silence-ms 600
+"""
+import argparse
+import json
+import statistics
+import sys
+import wave
+
+from app.services.endpointing import Endpointer
+
+RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = int(RATE * FRAME_MS / 1000) * 2
+
+
+def read_frames(path: str) -> list[bytes]:
+    with wave.open(path, "rb") as wf:
+        if wf.getframerate() != RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono 16-bit PCM")
+        pcm = wf.readframes(wf.getnframes())
+    return [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)]
+
+
+def replay(frames: list[bytes], ep: Endpointer) -> dict:
+    silence = b"\x00" * FRAME_BYTES
+    tail = int(ep.max_silence_ms / FRAME_MS) + 10
+    ends, last_voiced = [], None
+    for i, frame in enumerate(frames + [silence] * tail):
+        if i < len(frames) and ep.is_speech(frame):
+            last_voiced = i
+        _, end_of_turn = ep.push(frame)
+        if end_of_turn:
+            ends.append(i)
+    final = [e for e in ends if e >= len(frames)]
+    latency_ms = (final[0] - last_voiced) * FRAME_MS if final and last_voiced is not None else None
+    return {
+        "turns_detected": len(ends),
+        "false_splits": len([e for e in ends if e < len(frames)]),
+        "end_of_turn_latency_ms": latency_ms,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("wavs", nargs="+")
+    ap.add_argument("--aggressiveness", type=int)
+    ap.add_argument("--min-silence-ms", type=float)
+    ap.add_argument("--max-silence-ms", type=float)
+    ap.add_argument("--pause-factor", type=float)
+    ap.add_argument("--min-rms", type=float)
+    ap.add_argument("--preroll-ms", type=float)
+    ap.add_argument("--onset-ms", type=float)
+    ap.add_argument("--fresh", action="store_true",
+                    help="new detector per file instead of one learning across files (one speaker)")
+    args = ap.parse_args(argv)
+
+    knobs = {k: v for k, v in vars(args).items() if k not in ("wavs", "fresh") and v is not None}
+    ep = Endpointer(rate=RATE, frame_ms=FRAME_MS, **knobs)
+    per_file = {}
+    for path in args.wavs:
+        if args.fresh:
+            ep = Endpointer(rate=RATE, frame_ms=FRAME_MS, **knobs)
+        per_file[path] = replay(read_frames(path), ep)
+
+    latencies = [r["end_of_turn_latency_ms"] for r in per_file.values() if r["end_of_turn_latency_ms"] is not None]
+    splits = sum(r["false_splits"] for r in per_file.values())
+    summary = {
+        "files": len(per_file),
+        "false_split_rate": splits / len(per_file),
+        "files_with_false_split": sum(1 for r in per_file.values() if r["false_splits"]),
+        "missed_turns": sum(1 for r in per_file.values() if r["end_of_turn_latency_ms"] is None),
+        "latency_ms_p50": statistics.median(latencies) if latencies else None,
+        "latency_ms_p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        "knobs": knobs,
+    }
+    json.dump({"summary": summary, "files": per_file}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""
+Answer emits against the number of connected users.
+
+Answer tokens go only to the Socket.IO room of the session that asked
+(user_id:session_id), so the work per answer should not depend on how many
+other users are connected. The app runs under uvicorn against the stub
+OpenAI server and the database in DATABASE_URL (use a scratch one). For
+each count in --users, that many idle users connect and join their own
+session rooms. One speaker then streams a question --answers times, with a
+listener in its own room.
+
+For each count the bench reports:
+- events and bytes per answer at the listener;
+- events and bytes that reached the idle users (should be 0);
+- server CPU per answer.
+
+    python -m bench.room_fanout --users 0,50,200 --answers 3
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from bench.clients import SioClient, app_server, cpu_seconds, create_user, free_port, speech_pcm, stream_audio
+from bench.stub_openai import start as start_stub
+
+
+async def run(ws_base: str, pid: int, counts: list[int], answers: int, pcm: bytes) -> list[dict]:
+    http = ws_base.replace("ws://", "http://")
+    token, session_id = create_user(http)
+    listener = SioClient()
+    await listener.connect(ws_base, token, session_id)
+    idle: list[SioClient] = []
+    results = []
+    for n in counts:
+        while len(idle) < n:
+            client = SioClient()
+            await client.connect(ws_base, *create_user(http))
+            idle.append(client)
+        events0, bytes0 = len(listener.events), listener.event_bytes
+        idle0 = sum(len(c.events) for c in idle), sum(c.event_bytes for c in idle)
+        cpu0, t0 = cpu_seconds(pid), time.monotonic()
+        completed = 0
+        for _ in range(answers):
+            done0 = sum(1 for e in listener.events if e[1] == "complete")
+            await stream_audio(ws_base, token, session_id, pcm, realtime=False)
+            deadline = time.monotonic() + 30
+            while sum(1 for e in listener.events if e[1] == "complete") == done0 and time.monotonic() < deadline:
+                listener.changed.clear()
+                try:
+                    await asyncio.wait_for(listener.changed.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    pass
+            completed += sum(1 for e in listener.events if e[1] == "complete") > done0
+        cpu = cpu_seconds(pid) - cpu0
+        results.append({
+            "connected_users": n + 1,
+            "answers": completed,
+            "listener_events_per_answer": round((len(listener.events) - events0) / max(1, completed), 1),
+            "listener_bytes_per_answer": round((listener.event_bytes - bytes0) / max(1, completed)),
+            "idle_users_events": sum(len(c.events) for c in idle) - idle0[0],
+            "idle_users_bytes": sum(c.event_bytes for c in idle) - idle0[1],
+            "server_cpu_ms_per_answer": round(1000 * cpu / max(1, completed), 1),
+            "wall_sec": round(time.monotonic() - t0, 2),
+        })
+    for client in [listener, *idle]:
+        await client.close()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", default="0,50,200", help="idle users connected, comma separated, ascending")
+    ap.add_argument("--answers", type=int, default=3)
+    ap.add_argument("--answer-tokens", type=int, default=100)
+    args = ap.parse_args()
+    counts = sorted(int(n) for n in args.users.split(","))
+
+    stub, openai_url = start_stub(ttft_ms=50, tokens_per_sec=500, answer_tokens=args.answer_tokens)
+    port = free_port()
+    env = {"OPENAI_BASE_URL": openai_url, "OPENAI_API_KEY": "bench"}
+    pcm = speech_pcm(3.0) + b"\0" * 960 * 100
+    with app_server(port, env) as proc:
+        results = asyncio.run(run(f"ws://127.0.0.1:{port}", proc.pid, counts, args.answers, pcm))
+    stub.shutdown()
+    print(json.dumps({"answer_tokens": args.answer_tokens, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
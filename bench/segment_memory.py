@@ -0,0 +1,103 @@
+"""
+Per-connection memory for long sessions: list-of-frames segments vs SegmentBuffer.
+
+Replays one simulated session (turns of --min-sec..--max-sec of speech, some
+longer than the SEGMENT_MAX_SEC cap) through both ways of holding a segment,
+including the WAV bodies built for the partial-chunk uploads, and reports
+tracemalloc peak and CPU time per approach. Nothing is sent anywhere.
+
+    python -m bench.segment_memory --turns 200 --max-sec 90
+"""
+import argparse
+import io
+import json
+import random
+import time
+import tracemalloc
+import wave
+
+from app.services.audio_codec import pcm_to_wav
+from app.services.segment_buffer import SegmentBuffer
+
+RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = 960
+CHUNK_FRAMES = int(4000 / FRAME_MS)
+OVERLAP_FRAMES = int(600 / FRAME_MS)
+
+
+def legacy_wav(pcm: bytes) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def frames_of(turn_frames: int, rng: random.Random):
+    for _ in range(turn_frames):
+        yield rng.randbytes(FRAME_BYTES)       # stands in for one WebSocket message
+
+
+def run_legacy(turns: list[int], seed: int) -> None:
+    rng = random.Random(seed)
+    for n in turns:
+        frames, committed = [], 0
+        for frame in frames_of(n, rng):
+            frames.append(frame)
+            if len(frames) - committed >= CHUNK_FRAMES:
+                legacy_wav(b"".join(frames[max(0, committed - OVERLAP_FRAMES):]))
+                committed = len(frames)
+        legacy_wav(b"".join(frames[max(0, committed - OVERLAP_FRAMES):]))
+        b"".join(frames)                       # whole segment for the gate / fallback
+
+
+def run_buffer(turns: list[int], seed: int) -> None:
+    rng = random.Random(seed)
+    for n in turns:
+        segment, committed = SegmentBuffer(rate=RATE, frame_bytes=FRAME_BYTES), 0
+        for frame in frames_of(n, rng):
+            segment.extend((frame,))
+            if len(segment) - committed >= CHUNK_FRAMES:
+                pcm_to_wav(segment.pcm(max(0, committed - OVERLAP_FRAMES)))
+                committed = len(segment)
+            if segment.full:
+                pcm_to_wav(segment.pcm(max(0, committed - OVERLAP_FRAMES)))
+                segment, committed = SegmentBuffer(rate=RATE, frame_bytes=FRAME_BYTES), 0
+        pcm_to_wav(segment.pcm(max(0, committed - OVERLAP_FRAMES)))
+        segment.pcm()
+
+
+def measure(fn, turns, seed) -> dict:
+    tracemalloc.start()
+    t0 = time.process_time()
+    fn(turns, seed)
+    cpu = time.process_time() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_kb": round(peak / 1024, 1), "cpu_sec": round(cpu, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=100)
+    ap.add_argument("--min-sec", type=float, default=3.0)
+    ap.add_argument("--max-sec", type=float, default=90.0)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    turns = [int(rng.uniform(args.min_sec, args.max_sec) * 1000 / FRAME_MS) for _ in range(args.turns)]
+    print(json.dumps({
+        "turns": args.turns,
+        "speech_minutes": round(sum(turns) * FRAME_MS / 60000, 1),
+        "longest_turn_sec": round(max(turns) * FRAME_MS / 1000, 1),
+        "list_of_frames": measure(run_legacy, turns, args.seed),
+        "segment_buffer": measure(run_buffer, turns, args.seed),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local stand-in for the two OpenAI endpoints the app calls.
+
+POST /v1/audio/transcriptions  -> verbose_json after --asr-latency-ms
+POST /v1/chat/completions      -> SSE stream: first token after --ttft-ms,
+                                  then --tokens-per-sec until --answer-tokens
+
+Requests and accepted TCP connections are counted in the handler's `calls`.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m bench.stub_openai --port 9100 --ttft-ms 300 --tokens-per-sec 60
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUESTION = "How did you scale the ingestion pipeline at your last job?"
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    asr_latency_ms = 150.0
+    ttft_ms = 300.0
+    tokens_per_sec = 60.0
+    answer_tokens = 40
+    transcript = QUESTION
+    calls = {"transcriptions": 0, "chat": 0, "bytes_in": 0, "connections": 0}
+
+    def setup(self):
+        super().setup()
+        self.calls["connections"] += 1      # one handler instance per TCP connection
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.calls["bytes_in"] += len(body)
+        if self.path.endswith("/audio/transcriptions"):
+            self.calls["transcriptions"] += 1
+            time.sleep(self.asr_latency_ms / 1000)
+            self._json({"text": self.transcript, "segments": [{
+                "start": 0.0, "end": 2.0, "no_speech_prob": 0.01, "avg_logprob": -0.2, "compression_ratio": 1.2,
+            }]})
+        elif self.path.endswith("/chat/completions"):
+            self.calls["chat"] += 1
+            self._stream()
+        else:
+            self.send_error(404)
+
+    def _json(self, obj):
+        out = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.ttft_ms / 1000)
+        try:
+            for i in range(self.answer_tokens):
+                delta = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                         "choices": [{"index": 0, "delta": {"content": f"word{i} "}, "finish_reason": None}]}
+                self._chunk(f"data: {json.dumps(delta)}\n\n".encode())
+                if self.tokens_per_sec:
+                    time.sleep(1 / self.tokens_per_sec)
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass            # client cancelled the stream
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port: int = 0, **opts) -> tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, base_url)."""
+    handler = type("Stub", (StubOpenAI,), {**opts, "calls": {"transcriptions": 0, "chat": 0, "bytes_in": 0, "connections": 0}})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--asr-latency-ms", type=float, default=StubOpenAI.asr_latency_ms)
+    ap.add_argument("--ttft-ms", type=float, default=StubOpenAI.ttft_ms)
+    ap.add_argument("--tokens-per-sec", type=float, default=StubOpenAI.tokens_per_sec)
+    ap.add_argument("--answer-tokens", type=int, default=StubOpenAI.answer_tokens)
+    args = ap.parse_args()
+    server, url = start(args.port, asr_latency_ms=args.asr_latency_ms, ttft_ms=args.ttft_ms,
+                        tokens_per_sec=args.tokens_per_sec, answer_tokens=args.answer_tokens)
+    print("stub OpenAI at", url)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
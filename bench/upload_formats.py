@@ -0,0 +1,102 @@
+"""
+Upload size and end-to-end transcription latency per audio format.
+
+Starts a local stand-in for POST /v1/audio/transcriptions that answers with a
+verbose_json body after holding the request for size / --uplink-kbps (to
+model the client's uplink), points the OpenAI client at it through
+OPENAI_BASE_URL and times transcribe_pcm() for every available format.
+
+    python -m bench.upload_formats speech.wav --uplink-kbps 2000
+    python -m bench.upload_formats --seconds 30          # synthetic voiced signal
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+RATE = 16000
+
+
+class StubTranscriptions(BaseHTTPRequestHandler):
+    uplink_kbps = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.uplink_kbps:
+            time.sleep(len(body) * 8 / (self.uplink_kbps * 1000))
+        out = json.dumps({"text": "stub transcript", "segments": [{
+            "start": 0.0, "end": 1.0, "no_speech_prob": 0.01, "avg_logprob": -0.2, "compression_ratio": 1.2,
+        }]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+def load_pcm(path: str | None, seconds: float) -> bytes:
+    if path:
+        with wave.open(path, "rb") as wf:
+            assert wf.getnchannels() == 1 and wf.getsampwidth() == 2 and wf.getframerate() == RATE, \
+                "expected 16 kHz mono s16le"
+            return wf.readframes(wf.getnframes())
+    t = np.arange(int(seconds * RATE)) / RATE
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    voiced = sum(np.sin(2 * np.pi * np.cumsum(f0 * k) / RATE) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 2.5 * t), 0, None)
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.02
+    return (np.clip(voiced * envelope * 0.25 + noise, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("wav", nargs="?")
+    ap.add_argument("--seconds", type=float, default=30.0)
+    ap.add_argument("--uplink-kbps", type=float, default=2000.0, help="0 = loopback speed")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    StubTranscriptions.uplink_kbps = args.uplink_kbps
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTranscriptions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    from app.services.audio_codec import available_formats, encode
+    from app.services.transcribe import transcribe_audio_detailed
+
+    pcm = load_pcm(args.wav, args.seconds)
+    results = {}
+    for fmt in available_formats():
+        sizes, encode_ms, total_ms = [], [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            name, data, mime = encode(pcm, fmt)
+            t1 = time.perf_counter()
+            transcribe_audio_detailed(data, name, mime)
+            t2 = time.perf_counter()
+            sizes.append(len(data))
+            encode_ms.append((t1 - t0) * 1000)
+            total_ms.append((t2 - t0) * 1000)
+        results[fmt] = {
+            "bytes": sizes[0],
+            "ratio": round(len(pcm) / sizes[0], 2),
+            "encode_ms": round(statistics.median(encode_ms), 1),
+            "end_to_end_ms": round(statistics.median(total_ms), 1),
+        }
+    server.shutdown()
+    print(json.dumps({"audio_sec": len(pcm) / 2 / RATE, "uplink_kbps": args.uplink_kbps,
+                      "formats": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
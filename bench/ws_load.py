@@ -0,0 +1,102 @@
+"""
+Server CPU per /ws-audio stream for wire protocol v1 (one message per 30 ms
+frame) and v2 (multi-frame packets, app.services.ws_protocol).
+
+Starts the app under uvicorn in a child process, opens --streams concurrent
+connections that each send real-time voiced audio for --seconds, and reads
+the server's CPU time from /proc (Linux). Connections carry no token, so
+turns are not transcribed: the number is the cost of receiving, splitting
+and endpointing audio.
+
+    python -m bench.ws_load --streams 120 --seconds 20 --frames-per-packet 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+from app.services.ws_protocol import pack
+from bench.clients import FRAME_BYTES, FRAME_MS, cpu_seconds, free_port, scratch_dirs
+from bench.upload_formats import load_pcm
+
+
+async def stream(url: str, pcm: bytes, protocol: int, per_packet: int, seconds: float, lag: list) -> None:
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "session_id": None, "sample_rate": 16000,
+                                  "frame_ms": FRAME_MS, "protocols": [protocol]}))
+        ready = json.loads(await ws.recv())
+        assert ready["protocol"] == protocol, ready
+        n = per_packet if protocol == 2 else 1
+        step = n * FRAME_BYTES
+        start = time.monotonic()
+        seq, off = 0, 0
+        while time.monotonic() - start < seconds:
+            chunk = pcm[off:off + step]
+            if len(chunk) < step:
+                off, chunk = 0, pcm[:step]
+            off += step
+            await ws.send(pack(seq, int((time.monotonic() - start) * 1000), chunk, FRAME_BYTES)
+                          if protocol == 2 else chunk)
+            seq += 1
+            due = start + seq * n * FRAME_MS / 1000
+            delay = due - time.monotonic()
+            lag.append(max(0.0, -delay))
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def run(port: int, pid: int, protocol: int, args) -> dict:
+    pcm = load_pcm(None, 10.0)
+    lag: list[float] = []
+    url = f"ws://127.0.0.1:{port}/ws-audio"
+    cpu0, t0 = cpu_seconds(pid), time.monotonic()
+    await asyncio.gather(*[stream(url, pcm, protocol, args.frames_per_packet, args.seconds, lag)
+                           for _ in range(args.streams)])
+    cpu, wall = cpu_seconds(pid) - cpu0, time.monotonic() - t0
+    return {
+        "protocol": protocol,
+        "messages_per_stream_per_sec": round(1000 / FRAME_MS / (args.frames_per_packet if protocol == 2 else 1), 1),
+        "server_cpu_sec": round(cpu, 2),
+        "server_cpu_pct": round(100 * cpu / wall, 1),
+        "cpu_ms_per_stream_per_sec": round(1000 * cpu / wall / args.streams, 3),
+        "client_send_lag_p99_ms": round(1000 * sorted(lag)[int(0.99 * (len(lag) - 1))], 1) if lag else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--streams", type=int, default=120)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--frames-per-packet", type=int, default=5)
+    args = ap.parse_args()
+
+    port = free_port()
+    env = {**os.environ,
+           "DATABASE_URL": os.environ.get("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db"),
+           "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench"), **scratch_dirs()}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                               "--log-level", "warning", "--ws-max-size", str(1 << 20)],
+                              env=env, stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        results = [asyncio.run(run(port, server.pid, v, args)) for v in (1, 2)]
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps({"streams": args.streams, "seconds": args.seconds,
+                      "frames_per_packet": args.frames_per_packet, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
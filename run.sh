@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+# Start the app.
+#   ./run.sh                                   single worker, in-process Socket.IO
+#   WORKERS=4 SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 ./run.sh
+# Several workers need SOCKETIO_MESSAGE_QUEUE so answer tokens reach the browser
+# whichever worker its Socket.IO and /ws-audio connections landed on.
+set -euo pipefail
+
+HOST="${HOST:-0.0.0.0}"
+PORT="${PORT:-8001}"
+WORKERS="${WORKERS:-1}"
+
+if [ "$WORKERS" -gt 1 ] && [ -z "${SOCKETIO_MESSAGE_QUEUE:-}" ]; then
+    echo "WORKERS=$WORKERS needs SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0)" >&2
+    exit 1
+fi
+
+exec uvicorn app.main:app --host "$HOST" --port "$PORT" --workers "$WORKERS" "$@"